@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import load_data
+from db import ConnectionPool
+from mock_server import SyntheticSwapi
+from replay import FixtureStore, ReplaySession
+
+#Сквозной бенчмарк load_missing_characters: каждый прогон - отдельный процесс
+#(чистые глобальные счетчики и честный пик RSS), API - mock_server.py в этом процессе
+#или запись --replay внутри процесса прогона
+
+BENCH_SIZES = [500, 2000]
+BENCH_CONCURRENCY = [10, 50]
+#Лимит запросов/сек против mock-сервера без --rate: практически без ограничения,
+#иначе прогон меряет разгон token bucket с RATE_LIMIT_RPS, а не загрузчик
+BENCH_MOCK_RATE = 100000.0
+
+#Падение chars/sec больше этой доли относительно базового файла - регрессия
+REGRESSION_THRESHOLD = 0.10
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Linux - КиБ, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+#Один прогон (дочерний процесс)
+
+
+async def run_single(api_url: str, concurrency: int, db_path: str,
+                     replay_path: Optional[str], rate: Optional[float]) -> Dict:
+    load_data.API_BASE_URL = api_url
+    load_data.FETCH_WORKERS = concurrency
+    load_data.MAX_CONCURRENT_REQUESTS = concurrency
+    load_data.INITIAL_CONCURRENT_REQUESTS = min(load_data.INITIAL_CONCURRENT_REQUESTS, concurrency)
+    load_data.PIPELINE_QUEUE_SIZE = concurrency * 2
+    if rate:
+        load_data.RATE_LIMIT_RPS = rate
+        load_data.RATE_LIMIT_BURST = max(1, int(rate))
+        load_data.MAX_RATE_LIMIT_RPS = rate
+
+    session_factory = None
+    replay_session = None
+    if replay_path:
+        replay_session = ReplaySession.from_file(replay_path)
+
+        def session_factory():
+            return replay_session
+
+    stats = {}
+    started = time.perf_counter()
+    async with ConnectionPool(db_path) as pool:
+        saved, total = await load_data.load_missing_characters(pool, session_factory=session_factory, stats=stats)
+    elapsed = time.perf_counter() - started
+
+    cache = stats["cache"]
+    lookups = cache.hits + cache.issued + cache.coalesced
+    write_times = stats["write_times"]
+    return {
+        "seconds": round(elapsed, 3),
+        "characters": saved,
+        "jobs": total,
+        "chars_per_sec": round(saved / elapsed, 2) if elapsed else 0.0,
+        "limiter_requests": stats["limiter"].total_requests,
+        "throttled": stats["limiter"].throttled,
+        "replay_requests": replay_session.requests if replay_session else None,
+        #Настройки лимитера прогона: результаты с разными лимитами не сравниваются
+        "limiter": {
+            "rate": load_data.RATE_LIMIT_RPS,
+            "burst": load_data.RATE_LIMIT_BURST,
+            "max_rate": load_data.MAX_RATE_LIMIT_RPS,
+        },
+        "cache_hit_rate": round(cache.hits / lookups, 4) if lookups else None,
+        "db_batches": len(write_times),
+        "db_write_ms_avg": round(1000 * sum(write_times) / len(write_times), 2) if write_times else 0.0,
+        "db_write_ms_p95": round(1000 * percentile(write_times, 0.95), 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+#Оркестрация
+
+
+async def run_child(args: List[str]) -> Optional[Dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--child",
+            "--db", os.path.join(tmp, "bench.db"), "--result", result_path, *args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0 or not os.path.exists(result_path):
+            print(f"  Ошибка прогона: {stderr.decode(errors='replace').strip()[-500:]}")
+            return None
+        with open(result_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+async def run_mock_suite(sizes: List[int], concurrency_levels: List[int], latency: float,
+                         error_rate: float, rate: Optional[float]) -> List[Dict]:
+    rate = rate or BENCH_MOCK_RATE
+    results = []
+    for size in sizes:
+        server = SyntheticSwapi(characters=size, latency=latency, error_rate=error_rate)
+        runner = web.AppRunner(server.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        try:
+            for concurrency in concurrency_levels:
+                print(f"\nРазмер {size}, параллельность {concurrency}...")
+                server.requests = server.throttled = server.errors = 0
+                child_args = ["--api-url", f"http://127.0.0.1:{port}/api", "--concurrency", str(concurrency)]
+                if rate:
+                    child_args += ["--rate", str(rate)]
+                result = await run_child(child_args)
+                if result is None:
+                    continue
+                result.update(source="mock", size=size, concurrency=concurrency, http_requests=server.requests)
+                results.append(finish_result(result))
+        finally:
+            await runner.cleanup()
+    return results
+
+
+async def run_replay_suite(replay_path: str, api_url: str, concurrency_levels: List[int],
+                           rate: Optional[float]) -> List[Dict]:
+    #По умолчанию - базовый URL, сохраненный в записи
+    api_url = api_url or FixtureStore.read_base_url(replay_path) or load_data.API_BASE_URL
+    results = []
+    for concurrency in concurrency_levels:
+        print(f"\nЗапись {replay_path}, параллельность {concurrency}...")
+        child_args = ["--replay", replay_path, "--api-url", api_url, "--concurrency", str(concurrency)]
+        if rate:
+            child_args += ["--rate", str(rate)]
+        result = await run_child(child_args)
+        if result is None:
+            continue
+        result.update(source="replay", size=result["jobs"], concurrency=concurrency,
+                      http_requests=result["replay_requests"])
+        results.append(finish_result(result))
+    return results
+
+
+def finish_result(result: Dict) -> Dict:
+    characters = result["characters"]
+    result["requests_per_char"] = round(result["http_requests"] / characters, 3) if characters else None
+    print(f"  {result['chars_per_sec']} перс/сек, {result['requests_per_char']} запросов/перс, "
+          f"кэш {result['cache_hit_rate']}, запись {result['db_write_ms_avg']} мс, RSS {result['peak_rss_mb']} МиБ")
+    return result
+
+
+#Сравнение с базовым прогоном
+
+
+def result_key(result: Dict) -> str:
+    limiter = result.get("limiter") or {}
+    rate = f"{limiter['rate']:g}rps" if "rate" in limiter else "?"
+    return f"{result['source']}:{result['size']}:{result['concurrency']}:{rate}"
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> int:
+    #Таблица изменений chars/sec; возвращает число регрессий
+    base_by_key = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = 0
+
+    print("\n" + "=" * 100)
+    print(f"СРАВНЕНИЕ С {baseline.get('commit') or 'БАЗОЙ'}")
+    print("=" * 100)
+    for result in current["results"]:
+        base = base_by_key.get(result_key(result))
+        if not base or not base["chars_per_sec"]:
+            print(f"  {result_key(result):35}: нет в базовом прогоне")
+            continue
+        change = result["chars_per_sec"] / base["chars_per_sec"] - 1
+        mark = ""
+        if change < -threshold:
+            regressions += 1
+            mark = "  РЕГРЕССИЯ"
+        print(f"  {result_key(result):35}: {base['chars_per_sec']:>10} -> {result['chars_per_sec']:>10} "
+              f"({change:+.1%}){mark}")
+    return regressions
+
+
+async def run_suite(args) -> Dict:
+    if args.replay:
+        results = await run_replay_suite(args.replay, args.api_url, args.concurrency, args.rate)
+    else:
+        results = await run_mock_suite(args.sizes, args.concurrency, args.latency, args.error_rate, args.rate)
+
+    return {
+        "commit": current_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Сквозной бенчмарк загрузки персонажей')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCH_SIZES, help='Размеры синтетического набора')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=BENCH_CONCURRENCY,
+                        help='Уровни параллельности загрузки')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа mock-сервера, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503 mock-сервера')
+    parser.add_argument('--rate', type=float,
+                        help=f'Фиксированный лимит запросов/сек (mock-сервер по умолчанию - {BENCH_MOCK_RATE:g}, '
+                             f'--replay - настройки load_data.py)')
+    parser.add_argument('--replay', metavar='FILE', help='Вместо mock-сервера - запись load_data.py --record')
+    parser.add_argument('--api-url',
+                        help='Базовый URL, с которым сделана запись --replay (по умолчанию - из записи)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Файл результатов')
+    parser.add_argument('--compare', metavar='FILE', help='Сравнить с результатами прошлого прогона')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Допустимое падение chars/sec (доля)')
+    #Служебные параметры дочернего процесса
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(run_single(args.api_url, args.concurrency[0], args.db, args.replay, args.rate))
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    try:
+        report = asyncio.run(run_suite(args))
+    except KeyboardInterrupt:
+        print("\nПрервано пользователем")
+        sys.exit(1)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_results(baseline, report, args.threshold):
+            sys.exit(1)
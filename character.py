@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Tuple
+
+from schema import CHARACTER_COLUMNS
+
+
+class Character:
+    #Запись персонажа: поля в порядке CHARACTER_COLUMNS, as_row() - готовый кортеж для INSERT.
+    #relations (тип -> [(uid, имя)]) в таблицу characters не входит, идет в таблицы связей
+
+    __slots__ = tuple(CHARACTER_COLUMNS) + ("relations",)
+
+    def __init__(
+            self,
+            id: int,
+            name: str,
+            birth_year: str = "Unknown",
+            eye_color: str = "Unknown",
+            gender: str = "Unknown",
+            hair_color: str = "Unknown",
+            homeworld_name: str = "Unknown",
+            mass: str = "Unknown",
+            skin_color: str = "Unknown",
+            films: str = "",
+            species: str = "",
+            starships: str = "",
+            vehicles: str = "",
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+            content_hash: Optional[str] = None,
+            relations: Optional[Dict[str, List[Tuple[int, str]]]] = None
+    ):
+        self.id = id
+        self.name = name
+        self.birth_year = birth_year
+        self.eye_color = eye_color
+        self.gender = gender
+        self.hair_color = hair_color
+        self.homeworld_name = homeworld_name
+        self.mass = mass
+        self.skin_color = skin_color
+        self.films = films
+        self.species = species
+        self.starships = starships
+        self.vehicles = vehicles
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.relations = relations
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Character":
+        #Строка SELECT по CHARACTER_COLUMNS
+        return cls(*row)
+
+    def as_row(self) -> tuple:
+        return (
+            self.id, self.name, self.birth_year, self.eye_color, self.gender, self.hair_color,
+            self.homeworld_name, self.mass, self.skin_color, self.films, self.species,
+            self.starships, self.vehicles, self.etag, self.last_modified, self.content_hash,
+        )
+
+    def __repr__(self) -> str:
+        return f"Character(id={self.id!r}, name={self.name!r})"
@@ -0,0 +1,157 @@
+import aiosqlite
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "starwars_characters.db"
+
+#Профили PRAGMA для соединений
+PROFILES = {
+    #WAL: читатели (verify_db.py, отчет) не блокируют загрузку и наоборот
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # в КиБ
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    #Настройки SQLite по умолчанию, только ожидание блокировки
+    "default": {
+        "busy_timeout": 5000,
+    },
+}
+
+DB_PROFILE = "performance"
+
+#Размер кэша подготовленных выражений на соединение
+DB_STATEMENT_CACHE = 256
+
+#Читающих соединений в пуле
+DB_POOL_READERS = 2
+
+
+async def apply_profile(db: aiosqlite.Connection, profile: Union[str, Dict, None] = None):
+    #Профиль по имени или словарем PRAGMA
+    if profile is None:
+        profile = DB_PROFILE
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+
+    for pragma, value in profile.items():
+        await db.execute(f"PRAGMA {pragma} = {value}")
+
+
+async def open_connection(
+        path: str = DB_PATH,
+        profile: Union[str, Dict, None] = None,
+        readonly: bool = False
+) -> aiosqlite.Connection:
+    #Кэш подготовленных выражений sqlite3 переиспользует одинаковые запросы
+    db = await aiosqlite.connect(path, cached_statements=DB_STATEMENT_CACHE)
+    try:
+        await apply_profile(db, profile)
+        if readonly:
+            await db.execute("PRAGMA query_only = ON")
+    except Exception:
+        await db.close()
+        raise
+    return db
+
+
+async def close_connection(db: aiosqlite.Connection, readonly: bool = False):
+    #PRAGMA optimize (ANALYZE) - запись, поэтому только у пишущего соединения:
+    #читатели не должны бороться с загрузкой за блокировку записи
+    if not readonly:
+        try:
+            await db.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.debug(f"PRAGMA optimize: {e}")
+    await db.close()
+
+
+@asynccontextmanager
+async def connect(
+        path: str = DB_PATH,
+        profile: Union[str, Dict, None] = None,
+        readonly: bool = False
+) -> AsyncIterator[aiosqlite.Connection]:
+    #Соединение с профилем производительности; PRAGMA optimize при закрытии пишущего
+    db = await open_connection(path, profile, readonly)
+    try:
+        yield db
+    finally:
+        await close_connection(db, readonly)
+
+
+class ConnectionPool:
+    #Один писатель + N читателей, общие для всех этапов загрузки.
+    #Каждое соединение aiosqlite - отдельный поток, поэтому открываем их один раз
+
+    def __init__(
+            self,
+            path: str = DB_PATH,
+            readers: int = DB_POOL_READERS,
+            profile: Union[str, Dict, None] = None
+    ):
+        self.path = path
+        self.reader_count = readers
+        self.profile = profile
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+
+    async def open(self) -> "ConnectionPool":
+        if self._writer is not None:
+            return self
+        try:
+            self._writer = await open_connection(self.path, self.profile)
+            self._idle_readers = asyncio.Queue()
+            for _ in range(self.reader_count):
+                reader = await open_connection(self.path, self.profile, readonly=True)
+                self._readers.append(reader)
+                self._idle_readers.put_nowait(reader)
+        except Exception:
+            await self.close()
+            raise
+        return self
+
+    async def close(self):
+        #Завершение: PRAGMA optimize и закрытие всех соединений
+        for reader in self._readers:
+            await close_connection(reader, readonly=True)
+        self._readers = []
+        self._idle_readers = None
+        if self._writer is not None:
+            await close_connection(self._writer)
+            self._writer = None
+
+    async def __aenter__(self) -> "ConnectionPool":
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        #Единственное пишущее соединение, по одному пользователю за раз
+        async with self._write_lock:
+            yield self._writer
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        #Свободный читатель; без читателей в пуле - соединение писателя без блокировки,
+        #aiosqlite и так выполняет его запросы по очереди
+        if not self._readers:
+            yield self._writer
+            return
+
+        db = await self._idle_readers.get()
+        try:
+            yield db
+        finally:
+            self._idle_readers.put_nowait(db)
@@ -0,0 +1,300 @@
+import aiosqlite
+import asyncio
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from db import DB_PATH, connect
+from schema import RELATION_TYPES, join_table, migrate, table_columns
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+#Таблицы в порядке импорта: сущности раньше связей
+EXPORT_TABLES = [
+    "characters",
+    *RELATION_TYPES,
+    *(join_table(resource_type) for resource_type in RELATION_TYPES),
+    "resource_cache",
+]
+
+#Строк за один fetchmany/executemany
+EXPORT_CHUNK_SIZE = 1000
+
+#Собственный колоночный формат (если нет pyarrow): gzip-поток,
+#на таблицу - JSON-заголовок со словарями значений и массивы индексов по колонкам
+COLUMNAR_MAGIC = b"SWCOL1\n"
+
+
+def open_binary(path: str, mode: str):
+    #.gz - сжатый поток
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+async def existing_tables(db: aiosqlite.Connection) -> List[str]:
+    async with db.execute("SELECT name FROM sqlite_master WHERE type = 'table'") as cursor:
+        names = {row[0] for row in await cursor.fetchall()}
+    return [table for table in EXPORT_TABLES if table in names]
+
+
+async def iter_rows(db: aiosqlite.Connection, table: str, columns: List[str]):
+    async with db.execute(f"SELECT {', '.join(columns)} FROM {table}") as cursor:
+        while True:
+            rows = await cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            yield rows
+
+
+#JSONL
+
+
+async def export_jsonl(db: aiosqlite.Connection, path: str) -> Dict[str, int]:
+    #Строка файла: {"table": ..., "row": {...}}
+    counts = {}
+    with open_binary(path, "wb") as f:
+        for table in await existing_tables(db):
+            columns = await table_columns(db, table)
+            counts[table] = 0
+            async for rows in iter_rows(db, table, columns):
+                f.write("".join(
+                    json.dumps({"table": table, "row": dict(zip(columns, row))}, ensure_ascii=False) + "\n"
+                    for row in rows
+                ).encode("utf-8"))
+                counts[table] += len(rows)
+    return counts
+
+
+def read_jsonl(path: str) -> Iterator[Tuple[str, List[str], List[tuple]]]:
+    #Порции (таблица, колонки, строки) подряд идущих записей одной таблицы
+    table, columns, rows = None, None, []
+    with open_binary(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            row = record["row"]
+            if record["table"] != table or list(row) != columns or len(rows) >= EXPORT_CHUNK_SIZE:
+                if rows:
+                    yield table, columns, rows
+                table, columns, rows = record["table"], list(row), []
+            rows.append(tuple(row.values()))
+    if rows:
+        yield table, columns, rows
+
+
+#Колоночный формат
+
+
+def encode_column(values: List) -> Tuple[List, str, bytes]:
+    #Словарное кодирование: уникальные значения + минимальный по ширине массив индексов
+    #Ключ с типом: 1 и 1.0 - разные значения
+    dictionary = {}
+    indices = [dictionary.setdefault((type(value), value), len(dictionary)) for value in values]
+    typecode = "B" if len(dictionary) <= 0xFF else "H" if len(dictionary) <= 0xFFFF else "I"
+    data = array(typecode, indices)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return [value for _, value in dictionary], typecode, data.tobytes()
+
+
+def decode_column(dictionary: List, typecode: str, raw: bytes) -> List:
+    data = array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return [dictionary[i] for i in data]
+
+
+async def read_table_columns(db: aiosqlite.Connection, table: str) -> Tuple[List[str], List[List]]:
+    #Таблица целиком по колонкам
+    columns = await table_columns(db, table)
+    values = [[] for _ in columns]
+    async for rows in iter_rows(db, table, columns):
+        for row in rows:
+            for column_values, value in zip(values, row):
+                column_values.append(value)
+    return columns, values
+
+
+async def export_parquet(db: aiosqlite.Connection, path: str) -> Dict[str, int]:
+    #Каталог с Parquet-файлом на таблицу
+    os.makedirs(path, exist_ok=True)
+    counts = {}
+    for table in await existing_tables(db):
+        columns, values = await read_table_columns(db, table)
+        counts[table] = len(values[0]) if values else 0
+        parquet.write_table(
+            pyarrow.table(dict(zip(columns, values))),
+            os.path.join(path, f"{table}.parquet"),
+            compression="zstd"
+        )
+    return counts
+
+
+async def export_swcol(db: aiosqlite.Connection, path: str) -> Dict[str, int]:
+    counts = {}
+    with open_binary(path, "wb") as f:
+        f.write(COLUMNAR_MAGIC)
+        for table in await existing_tables(db):
+            columns, values = await read_table_columns(db, table)
+            counts[table] = len(values[0]) if values else 0
+
+            encoded = [encode_column(column_values) for column_values in values]
+            header = json.dumps({
+                "table": table,
+                "columns": columns,
+                "rows": counts[table],
+                "dictionaries": [dictionary for dictionary, _, _ in encoded],
+                "typecodes": [typecode for _, typecode, _ in encoded],
+            }, ensure_ascii=False).encode("utf-8")
+            f.write(struct.pack("<I", len(header)) + header)
+            for _, _, raw in encoded:
+                f.write(struct.pack("<I", len(raw)) + raw)
+
+        f.write(struct.pack("<I", 0))
+    return counts
+
+
+async def export_columnar(db: aiosqlite.Connection, path: str) -> Dict[str, int]:
+    #С pyarrow - Parquet, иначе собственный словарный формат
+    if pyarrow is not None:
+        return await export_parquet(db, path)
+    return await export_swcol(db, path)
+
+
+def read_columnar(path: str) -> Iterator[Tuple[str, List[str], List[tuple]]]:
+    with open_binary(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path}: не колоночный файл экспорта")
+        while True:
+            (size,) = struct.unpack("<I", f.read(4))
+            if size == 0:
+                break
+            header = json.loads(f.read(size))
+            columns = []
+            for dictionary, typecode in zip(header["dictionaries"], header["typecodes"]):
+                (raw_size,) = struct.unpack("<I", f.read(4))
+                columns.append(decode_column(dictionary, typecode, f.read(raw_size)))
+            rows = list(zip(*columns))
+            for start in range(0, len(rows), EXPORT_CHUNK_SIZE):
+                yield header["table"], header["columns"], rows[start:start + EXPORT_CHUNK_SIZE]
+
+
+def read_parquet_dir(path: str) -> Iterator[Tuple[str, List[str], List[tuple]]]:
+    if pyarrow is None:
+        raise RuntimeError("Для импорта Parquet нужен pyarrow")
+    for table in EXPORT_TABLES:
+        file_path = os.path.join(path, f"{table}.parquet")
+        if not os.path.exists(file_path):
+            continue
+        parquet_file = parquet.ParquetFile(file_path)
+        columns = parquet_file.schema_arrow.names
+        for batch in parquet_file.iter_batches(batch_size=EXPORT_CHUNK_SIZE):
+            yield table, columns, list(zip(*(batch.column(name).to_pylist() for name in columns)))
+
+
+#Импорт
+
+
+def detect_reader(path: str) -> Iterator[Tuple[str, List[str], List[tuple]]]:
+    if os.path.isdir(path):
+        return read_parquet_dir(path)
+    with open_binary(path, "rb") as f:
+        head = f.read(len(COLUMNAR_MAGIC))
+    if head == COLUMNAR_MAGIC:
+        return read_columnar(path)
+    return read_jsonl(path)
+
+
+async def import_file(db: aiosqlite.Connection, path: str) -> Dict[str, int]:
+    #Одна транзакция; вторичные индексы удаляются и строятся заново после вставки
+    await migrate(db)
+
+    async with db.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL
+          AND tbl_name IN ({', '.join('?' * len(EXPORT_TABLES))})
+    """, EXPORT_TABLES) as cursor:
+        indexes = await cursor.fetchall()
+
+    target_columns = {table: set(await table_columns(db, table)) for table in EXPORT_TABLES}
+    counts = {}
+
+    try:
+        await db.execute("BEGIN")
+        for name, _ in indexes:
+            await db.execute(f"DROP INDEX {name}")
+
+        for table, columns, rows in detect_reader(path):
+            if table not in target_columns:
+                continue
+            #Колонки, которых нет в текущей схеме, пропускаются
+            keep = [i for i, column in enumerate(columns) if column in target_columns[table]]
+            names = [columns[i] for i in keep]
+            await db.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [tuple(row[i] for i in keep) for row in rows]
+            )
+            counts[table] = counts.get(table, 0) + len(rows)
+
+        for _, sql in indexes:
+            await db.execute(sql)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    return counts
+
+
+async def run(command: str, path: str, fmt: str, db_path: str):
+    started = time.time()
+    async with connect(db_path) as db:
+        if command == "export":
+            if fmt == "columnar":
+                counts = await export_columnar(db, path)
+            else:
+                counts = await export_jsonl(db, path)
+        else:
+            counts = await import_file(db, path)
+
+    print("=" * 100)
+    print("ЭКСПОРТ ЗАВЕРШЕН" if command == "export" else "ИМПОРТ ЗАВЕРШЕН")
+    print("=" * 100)
+    for table, count in counts.items():
+        print(f"  {table:25}: {count}")
+    print(f"Время: {time.time() - started:.2f} сек")
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Экспорт и импорт базы персонажей')
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('path', help='Файл (.gz - со сжатием) или каталог Parquet')
+    parser.add_argument('--format', choices=['jsonl', 'columnar'], default='jsonl',
+                        help='Формат экспорта; columnar - Parquet при наличии pyarrow')
+    parser.add_argument('--db', default=DB_PATH, help='Файл базы данных')
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.command, args.path, args.format, args.db))
+    except KeyboardInterrupt:
+        print("\nОперация прервана")
+    except Exception as e:
+        print(f"\nКритическая ошибка: {e}")
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+#HTTP-клиент для одного хоста API: один TCPConnector на все этапы,
+#соединения держатся открытыми между запросами, DNS кэшируется
+
+#Соединений на хост: по умолчанию под максимальное окно лимитера
+HTTP_CONNECTIONS_PER_HOST = 50
+#Общий предел пула (запас на редкие запросы к другим хостам)
+HTTP_CONNECTIONS_TOTAL = HTTP_CONNECTIONS_PER_HOST + 10
+#Кэш DNS, сек
+HTTP_DNS_CACHE_TTL = 300
+#Сколько простаивающее соединение остается в пуле, сек
+HTTP_KEEPALIVE_TIMEOUT = 60.0
+
+#Единые таймауты: запрос одной записи и страница списка (expanded - крупнее)
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5, sock_connect=5, sock_read=10)
+PAGE_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_connect=5, sock_read=20)
+
+
+def create_connector(connections_per_host: int = HTTP_CONNECTIONS_PER_HOST) -> aiohttp.TCPConnector:
+    return aiohttp.TCPConnector(
+        limit=max(HTTP_CONNECTIONS_TOTAL, connections_per_host),
+        limit_per_host=connections_per_host,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+
+
+def create_client_session(
+        connections_per_host: int = HTTP_CONNECTIONS_PER_HOST,
+        trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+        http2: bool = False
+):
+    #aiohttp.ClientSession с настроенным пулом; http2 - клиент httpx (только он умеет HTTP/2)
+    if http2:
+        return Http2Session(connections_per_host)
+    return aiohttp.ClientSession(
+        connector=create_connector(connections_per_host),
+        timeout=REQUEST_TIMEOUT,
+        trace_configs=trace_configs,
+    )
+
+
+#HTTP/2 через httpx: тот же интерфейс get/head, что использует загрузчик
+
+
+class Http2Response:
+    #Минимальная замена aiohttp.ClientResponse поверх ответа httpx
+
+    def __init__(self, response):
+        self._response = response
+        self.method = response.request.method
+        self.url = str(response.request.url)
+        self.status = response.status_code
+        self.headers = CIMultiDictProxy(CIMultiDict(response.headers.items()))
+
+    async def read(self) -> bytes:
+        return self._response.content
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return self._response.content.decode(encoding)
+
+    async def json(self, **kwargs):
+        return json.loads(self._response.content) if self._response.content else None
+
+    def release(self):
+        pass
+
+
+class _Http2Request:
+
+    def __init__(self, owner: "Http2Session", method: str, url: str, kwargs: Dict):
+        self.owner = owner
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    async def __aenter__(self) -> Http2Response:
+        timeout = self.kwargs.get("timeout") or REQUEST_TIMEOUT
+        if isinstance(timeout, (int, float)):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        #Ошибки httpx - в типы aiohttp/asyncio, которые ловит загрузчик
+        try:
+            response = await self.owner.client.request(
+                self.method,
+                self.url,
+                headers=self.kwargs.get("headers"),
+                follow_redirects=self.kwargs.get("allow_redirects", True),
+                timeout=httpx.Timeout(timeout.total, connect=timeout.connect, read=timeout.sock_read),
+            )
+        except httpx.TimeoutException as e:
+            raise asyncio.TimeoutError(f"{type(e).__name__}: {e}") from e
+        except httpx.HTTPError as e:
+            raise aiohttp.ClientError(f"{type(e).__name__}: {e}") from e
+        return Http2Response(response)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class Http2Session:
+
+    def __init__(self, connections_per_host: int = HTTP_CONNECTIONS_PER_HOST):
+        if httpx is None:
+            raise RuntimeError("Для HTTP/2 нужен пакет httpx[http2]")
+        #Поверх HTTP/2 запросы мультиплексируются, пул обычно держит одно соединение
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=connections_per_host,
+                max_keepalive_connections=connections_per_host,
+                keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT,
+            ),
+        )
+
+    def request(self, method: str, url: str, **kwargs) -> _Http2Request:
+        return _Http2Request(self, method.upper(), url, kwargs)
+
+    def get(self, url: str, **kwargs) -> _Http2Request:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> _Http2Request:
+        return self.request("HEAD", url, **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "Http2Session":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -1,20 +1,96 @@
 import aiohttp
 import asyncio
 import aiosqlite
+import json
 import logging
-from typing import List, Dict, Optional, Set
+import os
+import random
+from typing import Callable, List, Dict, Optional, Set, Tuple
 import sys
 import time
 
-#Ошибки
+import metrics
+from character import Character
+from db import ConnectionPool
+from http_client import PAGE_TIMEOUT, create_client_session
+from payloads import content_hash, decode_person, decode_resource_name, loads
+from rate_limiter import AdaptiveRateLimiter
+from replay import FixtureStore, RecordingSession, ReplaySession
+from schema import CHARACTER_COLUMNS, RELATION_TYPES, migrate, save_relations, uid_from_url
+from tracing import JsonlSink, OpenTelemetrySink, RequestTracer, RingBufferSink, print_slowest_endpoints
+
+#Ошибки; уровень - LOG_LEVEL или --log-level
 logging.basicConfig(
-    level=logging.WARNING,
+    level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
     format='%(asctime)s | %(levelname)s | %(message)s'
 )
 logger = logging.getLogger(__name__)
 
 API_BASE_URL = "https://www.swapi.tech/api"
-MAX_CONCURRENT_REQUESTS = 10  # Семафор как в ТЗ
+#Адаптивный лимитер: стартовые значения, дальше подстраивается под ответы API
+INITIAL_CONCURRENT_REQUESTS = 10
+MAX_CONCURRENT_REQUESTS = 50
+RATE_LIMIT_RPS = 20.0
+RATE_LIMIT_BURST = 20
+MAX_RATE_LIMIT_RPS = 100.0
+LATENCY_TARGET = 2.0
+
+#Конвейер загрузки
+FETCH_WORKERS = MAX_CONCURRENT_REQUESTS
+PIPELINE_QUEUE_SIZE = FETCH_WORKERS * 2
+DB_BATCH_SIZE = 50
+DB_FLUSH_INTERVAL = 1.0
+
+#Постоянный кэш связанных сущностей
+RESOURCE_CACHE_TTL = 7 * 24 * 3600
+RESOURCE_CACHE_MAX_ENTRIES = 10000
+#Попыток загрузки связанного ресурса или страницы справочника
+RESOURCE_FETCH_RETRIES = 3
+
+#Предзагрузка справочников перед загрузкой персонажей
+PREFETCH_RESOURCE_TYPES = ["planets", "films", "species", "starships", "vehicles"]
+PREFETCH_PAGE_SIZE = 100
+
+#Размер страницы /people при параллельном поиске ID
+DISCOVERY_PAGE_SIZE = 100
+
+#Перебор ID: запас сверх total_records и режим без total_records
+PROBE_MARGIN = 10
+PROBE_MIN_IDS = 30
+PROBE_MAX_ID = 150
+
+#Инкрементальная синхронизация
+UNCHANGED = object()
+
+#Отчет: число примеров и попыток случайного поиска на пример
+REPORT_SAMPLES = 3
+REPORT_SAMPLE_ATTEMPTS = 5
+
+#Очередь заданий: повторы упавших ID между запусками
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE = 60.0
+JOB_RETRY_MAX = 24 * 3600.0
+
+
+class FetchFailure:
+    #Неудачная загрузка персонажа; ложна в bool, как прежний None
+
+    __slots__ = ("reason", "permanent")
+
+    def __init__(self, reason: str, permanent: bool = False):
+        self.reason = reason
+        self.permanent = permanent
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return f"FetchFailure({self.reason!r}, permanent={self.permanent})"
+
+
+class ResourceFetchError(Exception):
+    #Связанный ресурс не загрузился и после повторов: персонаж не сохраняется с пропусками
+    pass
 
 
 class ProgressTracker:
@@ -28,6 +104,7 @@ class ProgressTracker:
         self.existing_in_db = 0
         self.missing_characters = 0
         self.loaded_characters = 0
+        self.unchanged_characters = 0
         self.total_in_db = 0
         self.current_page = 0
         self.total_pages = 0
@@ -42,6 +119,7 @@ class ProgressTracker:
     def end_stage(self):
         if self.current_stage:
             duration = time.time() - self.stage_start_time
+            metrics.STAGE_SECONDS.set(duration, stage=self.current_stage)
             print(f"\n{self.current_stage} завершен за {duration:.1f} сек")
             self.current_stage = ""
             self.current_page = 0
@@ -93,19 +171,115 @@ class ProgressTracker:
         print(f"Найдено в API: {self.total_api_characters} персонажей")
         print(f"Было в базе: {self.existing_in_db} персонажей")
         print(f"Загружено новых: {self.loaded_characters} персонажей")
+        if self.unchanged_characters:
+            print(f"Без изменений: {self.unchanged_characters} персонажей")
         print(f"Всего в базе: {self.total_in_db} персонажей")
+
+        #Куда ушло время: запросы, кэш, запись в БД
+        requests = metrics.HTTP_REQUESTS.total()
+        if requests:
+            ok = metrics.HTTP_LATENCY.summary().get("status=200")
+            print(f"Запросов к API: {int(requests)}, повторов: {int(metrics.HTTP_RETRIES.total())}"
+                  + (f", p95 успешных: {ok['p95']:.3f} сек" if ok else ""))
+        hit_ratio = metrics.cache_hit_ratio()
+        if hit_ratio is not None:
+            print(f"Попаданий в кэш ресурсов: {hit_ratio:.1%}")
+        batches = metrics.DB_BATCH_SECONDS.summary().get("")
+        if batches:
+            print(f"Запись в БД: {batches['count']} пачек, среднее {batches['avg'] * 1000:.1f} мс")
+        print_slowest_endpoints()
         print(f"{'=' * 100}")
 
 
 #Прогресс
 progress_tracker = ProgressTracker()
 
+#Спаны исходящих запросов; приемники добавляются флагами --trace/--trace-otel
+request_tracer = RequestTracer([RingBufferSink()])
 
-class ResourceCache:
-    #Кэш
 
-    def __init__(self):
+def create_rate_limiter() -> AdaptiveRateLimiter:
+    #Общий лимитер для всех запросов к API
+    return AdaptiveRateLimiter(
+        rate=RATE_LIMIT_RPS,
+        burst=RATE_LIMIT_BURST,
+        initial_concurrency=INITIAL_CONCURRENT_REQUESTS,
+        max_concurrency=MAX_CONCURRENT_REQUESTS,
+        max_rate=MAX_RATE_LIMIT_RPS,
+        latency_target=LATENCY_TARGET
+    )
+
+
+class ResourceCache:
+    #Кэш: в памяти + таблица resource_cache в той же БД (TTL, LRU)
+
+    def __init__(
+            self,
+            limiter: AdaptiveRateLimiter,
+            ttl: float = RESOURCE_CACHE_TTL,
+            max_entries: int = RESOURCE_CACHE_MAX_ENTRIES
+    ):
         self.cache = {}
+        self.limiter = limiter
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        #url -> (etag, last_modified, fetched_at)
+        self.meta = {}
+        #Просроченные записи: url -> (name, etag, last_modified), для условных запросов
+        self.stale = {}
+        self.dirty = set()
+        self.touched = set()
+        #url -> задача идущего запроса
+        self.pending = {}
+
+        self.hits = 0
+        self.issued = 0
+        self.coalesced = 0
+        self.revalidated = 0
+
+    async def load(self, db: aiosqlite.Connection):
+        #Загрузка сохраненного кэша
+        now = time.time()
+        async with db.execute(
+                "SELECT url, name, etag, last_modified, fetched_at FROM resource_cache"
+        ) as cursor:
+            async for url, name, etag, last_modified, fetched_at in cursor:
+                if fetched_at + self.ttl > now:
+                    self.cache[url] = name
+                    self.meta[url] = (etag, last_modified, fetched_at)
+                else:
+                    self.stale[url] = (name, etag, last_modified)
+
+    async def save(self, db: aiosqlite.Connection):
+        #Сохранение новых записей, отметка использованных и вытеснение LRU
+        now = time.time()
+        try:
+            await db.executemany("""
+                INSERT OR REPLACE INTO resource_cache
+                (url, name, etag, last_modified, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(url, self.cache[url], *self.meta[url], now) for url in self.dirty])
+            await db.executemany(
+                "UPDATE resource_cache SET last_access = ? WHERE url = ?",
+                [(now, url) for url in self.touched - self.dirty]
+            )
+            await db.execute("""
+                DELETE FROM resource_cache WHERE url NOT IN (
+                    SELECT url FROM resource_cache ORDER BY last_access DESC LIMIT ?
+                )
+            """, (self.max_entries,))
+            await db.commit()
+            self.dirty.clear()
+            self.touched.clear()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения кэша ресурсов: {e}")
+
+    def _store(self, url: str, name: str, etag: Optional[str], last_modified: Optional[str]):
+        self.cache[url] = name
+        self.meta[url] = (etag, last_modified, time.time())
+        self.stale.pop(url, None)
+        self.dirty.add(url)
 
     async def get_name(self, session: aiohttp.ClientSession, url: str, resource_type: str) -> str:
         if not url:
@@ -113,27 +287,144 @@ class ResourceCache:
 
         # Проверяем кэш
         if url in self.cache:
+            self.hits += 1
+            metrics.CACHE_LOOKUPS.inc(result="hit")
+            self.touched.add(url)
             return self.cache[url]
 
-        try:
-            async with session.get(url, timeout=5) as response:
-                if response.status == 200:
-                    data = await response.json()
-
-                    if resource_type == "planets":
-                        name = data.get("result", {}).get("properties", {}).get("name", "Unknown")
-                    elif resource_type == "films":
-                        name = data.get("result", {}).get("properties", {}).get("title", "Unknown")
-                    else:
-                        name = data.get("result", {}).get("properties", {}).get("name", "Unknown")
+        #Один запрос на URL: остальные ждут уже идущий
+        task = self.pending.get(url)
+        if task is not None:
+            self.coalesced += 1
+            metrics.CACHE_LOOKUPS.inc(result="coalesced")
+        else:
+            metrics.CACHE_LOOKUPS.inc(result="miss")
+            task = asyncio.ensure_future(self._fetch_name(session, url, resource_type))
+            self.pending[url] = task
+            task.add_done_callback(lambda _: self.pending.pop(url, None))
+
+        #shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    async def _fetch_name(self, session: aiohttp.ClientSession, url: str, resource_type: str) -> str:
+        #Ошибка не кэшируется: следующий вызов повторит запрос
+        self.issued += 1
+
+        #Условный запрос для просроченной записи
+        headers = {}
+        stale = self.stale.get(url)
+        if stale:
+            if stale[1]:
+                headers["If-None-Match"] = stale[1]
+            if stale[2]:
+                headers["If-Modified-Since"] = stale[2]
+
+        last_error = "нет ответа"
+        for attempt in range(RESOURCE_FETCH_RETRIES):
+            try:
+                async with self.limiter.slot() as slot, session.get(
+                        url, headers=headers, trace_request_ctx={"attempt": attempt}
+                ) as response:
+                    slot.observe(response)
+                    if response.status == 304 and stale:
+                        self.revalidated += 1
+                        metrics.CACHE_FETCHES.inc(result="not_modified")
+                        self._store(url, stale[0], stale[1], stale[2])
+                        return stale[0]
 
-                    #Кэш
-                    self.cache[url] = name
-                    return name
-        except:
-            pass
+                    if response.status == 200:
+                        name = decode_resource_name(await response.read(), resource_type) or "Unknown"
+
+                        #Кэш
+                        self._store(url, name, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                        metrics.CACHE_FETCHES.inc(result="ok")
+                        return name
+
+                    #Ресурса нет в API - повтор не поможет
+                    if response.status == 404:
+                        metrics.CACHE_FETCHES.inc(result="not_found")
+                        logger.warning(f"Ресурс {url}: HTTP 404")
+                        return stale[0] if stale else "Unknown"
+
+                    metrics.CACHE_FETCHES.inc(result="http_error")
+                    last_error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                metrics.CACHE_FETCHES.inc(result="error")
+                last_error = f"{type(e).__name__}: {e}"
+
+            logger.warning(f"Ресурс {url} ({attempt + 1}/{RESOURCE_FETCH_RETRIES}): {last_error}")
+            if attempt < RESOURCE_FETCH_RETRIES - 1:
+                await self.limiter.backoff(attempt)
+
+        #Лучше устаревшее имя, чем пропуск
+        if stale:
+            return stale[0]
+
+        #Без имени персонаж сохранился бы без планеты/связей навсегда:
+        #--sync не перезагрузит неизменившуюся запись
+        raise ResourceFetchError(f"ресурс {url}: {last_error}")
+
+    async def prefetch(self, session: aiohttp.ClientSession, resource_types: List[str] = PREFETCH_RESOURCE_TYPES) -> int:
+        #Массовая загрузка справочников со списочных эндпоинтов
+        counts = await asyncio.gather(*[self._prefetch_type(session, rt) for rt in resource_types])
+        return sum(counts)
+
+    async def _prefetch_type(self, session: aiohttp.ClientSession, resource_type: str) -> int:
+        stored = 0
+        current_url = f"{API_BASE_URL}/{resource_type}?page=1&limit={PREFETCH_PAGE_SIZE}&expanded=true"
+        seen_urls = set()
+
+        while current_url and current_url not in seen_urls:
+            seen_urls.add(current_url)
+            data = await self._prefetch_page(session, resource_type, current_url)
+            if data is None:
+                break
+
+            #films отдает весь список в result, остальные - постранично в results
+            items = data.get("results")
+            if items is None:
+                items = data.get("result", [])
+            if not isinstance(items, list):
+                break
+
+            for item in items:
+                props = item.get("properties", {})
+                url = item.get("url") or props.get("url")
+                name = props.get("title") or props.get("name") or item.get("title") or item.get("name")
+                if url and name:
+                    self._store(url, name, None, None)
+                    stored += 1
+
+            current_url = data.get("next")
+
+        return stored
+
+    async def _prefetch_page(self, session: aiohttp.ClientSession, resource_type: str, url: str) -> Optional[Dict]:
+        #Страница справочника с повторами; Retry-After учитывает лимитер через slot.observe.
+        #None - тип догружается поштучно при промахах
+        for attempt in range(RESOURCE_FETCH_RETRIES):
+            try:
+                async with self.limiter.slot() as slot, session.get(
+                        url, timeout=PAGE_TIMEOUT, trace_request_ctx={"attempt": attempt}
+                ) as response:
+                    slot.observe(response)
+                    if response.status == 200:
+                        data = loads(await response.read())
+                        metrics.PREFETCH_PAGES.inc(result="ok")
+                        return data if isinstance(data, dict) else None
+                    metrics.PREFETCH_PAGES.inc(result="http_error")
+                    logger.warning(f"Предзагрузка {resource_type} ({attempt + 1}/{RESOURCE_FETCH_RETRIES}): "
+                                   f"HTTP {response.status}")
+                    if response.status == 404:
+                        return None
+            except Exception as e:
+                metrics.PREFETCH_PAGES.inc(result="error")
+                logger.warning(f"Ошибка предзагрузки {resource_type} ({attempt + 1}/{RESOURCE_FETCH_RETRIES}): "
+                               f"{type(e).__name__}: {e}")
 
-        return "Unknown"
+            if attempt < RESOURCE_FETCH_RETRIES - 1:
+                await self.limiter.backoff(attempt)
+        return None
 
     async def get_names_from_urls(self, session: aiohttp.ClientSession, urls: List[str], resource_type: str) -> str:
         if not urls:
@@ -146,10 +437,117 @@ class ResourceCache:
         valid_names = [name for name in names if name and name != "Unknown"]
         return ", ".join(valid_names) if valid_names else ""
 
+    async def get_entities_from_urls(
+            self,
+            session: aiohttp.ClientSession,
+            urls: List[str],
+            resource_type: str
+    ) -> List[Tuple[int, str]]:
+        #(uid, имя) для таблиц связей
+        if not urls:
+            return []
+
+        names = await asyncio.gather(*[self.get_name(session, url, resource_type) for url in urls])
 
-async def get_all_character_ids_with_next_check(session: aiohttp.ClientSession) -> List[int]:
+        entities = []
+        for url, name in zip(urls, names):
+            uid = uid_from_url(url)
+            if uid is not None and name and name != "Unknown":
+                entities.append((uid, name))
+        return entities
+
+
+def extract_people_ids(results: List[Dict]) -> Set[int]:
+    #ID со страницы списка
+    ids = set()
+    for person in results:
+        try:
+            ids.add(int(person["uid"]))
+        except (KeyError, ValueError, TypeError):
+            continue
+    return ids
+
+
+async def fetch_people_page(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter,
+        page: int,
+        limit: int,
+        max_retries: int = 3
+) -> Optional[Dict]:
+    #Одна страница /people с повторами
+    url = f"{API_BASE_URL}/people?page={page}&limit={limit}"
+    for attempt in range(max_retries):
+        try:
+            async with limiter.slot() as slot, session.get(
+                    url, timeout=PAGE_TIMEOUT, trace_request_ctx={"attempt": attempt}
+            ) as response:
+                slot.observe(response)
+                if response.status == 200:
+                    return loads(await response.read())
+                if response.status == 404:
+                    return None
+                metrics.DISCOVERY_FAILURES.inc(result="http_error")
+                logger.warning(f"Страница {page} ({attempt + 1}/{max_retries}): HTTP {response.status}")
+        except asyncio.TimeoutError:
+            metrics.DISCOVERY_FAILURES.inc(result="timeout")
+            logger.warning(f"Страница {page} ({attempt + 1}/{max_retries}): таймаут")
+        except Exception as e:
+            metrics.DISCOVERY_FAILURES.inc(result="error")
+            logger.warning(f"Ошибка страницы {page} ({attempt + 1}/{max_retries}): {type(e).__name__}: {e}")
+
+        if attempt < max_retries - 1:
+            await limiter.backoff(attempt)
+    return None
+
+
+async def get_all_character_ids_fast(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter
+) -> Optional[List[int]]:
+    #Быстрый режим: первая страница дает total_pages, остальные параллельно.
+    #None - метаданных нет или они не сходятся, нужен последовательный обход
+    first_page = await fetch_people_page(session, limiter, 1, DISCOVERY_PAGE_SIZE)
+    if not first_page or "results" not in first_page:
+        return None
+
+    try:
+        total_pages = int(first_page["total_pages"])
+        total_records = int(first_page["total_records"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if total_pages < 1 or total_records < 0:
+        return None
+
+    progress_tracker.total_api_characters = total_records
+    progress_tracker.total_pages = total_pages
+
+    all_ids = extract_people_ids(first_page["results"])
+
+    pages = await asyncio.gather(*[
+        fetch_people_page(session, limiter, page, DISCOVERY_PAGE_SIZE)
+        for page in range(2, total_pages + 1)
+    ])
+
+    for data in pages:
+        if not data or "results" not in data:
+            return None
+        all_ids.update(extract_people_ids(data["results"]))
+
+    if len(all_ids) < total_records:
+        return None
+
+    progress_tracker.show_search_progress(len(all_ids), total_records)
+    return sorted(all_ids)
+
+
+async def get_all_character_ids_with_next_check(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter
+) -> List[int]:
    #Получение персонажей
-    all_ids = []
+    all_ids = set()
     current_url = f"{API_BASE_URL}/people?page=1"
     page_num = 1
     max_pages = 50
@@ -160,13 +558,23 @@ async def get_all_character_ids_with_next_check(session: aiohttp.ClientSession)
 
         for attempt in range(max_retries):
             try:
-                async with session.get(current_url, timeout=15) as response:
+                async with limiter.slot() as slot, session.get(
+                        current_url, timeout=PAGE_TIMEOUT, trace_request_ctx={"attempt": attempt}
+                ) as response:
+                    slot.observe(response)
                     if response.status == 200:
-                        data = await response.json()
+                        data = loads(await response.read())
 
                         if "results" not in data:
                             break
 
+                        #total_records с первой страницы, повторный запрос не нужен
+                        if page_num == 1:
+                            try:
+                                progress_tracker.total_api_characters = int(data.get("total_records") or 0)
+                            except (TypeError, ValueError):
+                                pass
+
                         results = data.get("results", [])
 
                         if not results:
@@ -178,15 +586,7 @@ async def get_all_character_ids_with_next_check(session: aiohttp.ClientSession)
                             return sorted(all_ids)
 
                         #ID страницы
-                        page_ids = []
-                        for person in results:
-                            try:
-                                uid = int(person["uid"])
-                                if uid not in all_ids:
-                                    page_ids.append(uid)
-                                    all_ids.append(uid)
-                            except (KeyError, ValueError):
-                                continue
+                        all_ids.update(extract_people_ids(results))
 
                         #Прогресс
                         progress_tracker.show_search_progress(
@@ -225,19 +625,25 @@ async def get_all_character_ids_with_next_check(session: aiohttp.ClientSession)
                         )
                         return sorted(all_ids)
                     else:
+                        metrics.DISCOVERY_FAILURES.inc(result="http_error")
+                        logger.warning(f"Страница {page_num} ({attempt + 1}/{max_retries}): HTTP {response.status}")
                         if attempt == max_retries - 1:
                             return sorted(all_ids)
-                        await asyncio.sleep(2 ** attempt)
+                        await limiter.backoff(attempt)
 
             except asyncio.TimeoutError:
+                metrics.DISCOVERY_FAILURES.inc(result="timeout")
+                logger.warning(f"Страница {page_num} ({attempt + 1}/{max_retries}): таймаут")
                 if attempt == max_retries - 1:
                     return sorted(all_ids)
-                await asyncio.sleep(2 ** attempt)
+                await limiter.backoff(attempt)
 
-            except Exception:
+            except Exception as e:
+                metrics.DISCOVERY_FAILURES.inc(result="error")
+                logger.warning(f"Ошибка страницы {page_num} ({attempt + 1}/{max_retries}): {type(e).__name__}: {e}")
                 if attempt == max_retries - 1:
                     return sorted(all_ids)
-                await asyncio.sleep(2 ** attempt)
+                await limiter.backoff(attempt)
 
     progress_tracker.show_search_progress(
         len(all_ids),
@@ -246,102 +652,131 @@ async def get_all_character_ids_with_next_check(session: aiohttp.ClientSession)
     return sorted(all_ids)
 
 
-async def check_id_range(session: aiohttp.ClientSession, start: int, end: int) -> List[int]:
-    #ID проверка
+async def check_ids(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter,
+        ids_to_check: List[int],
+        needed: Optional[int] = None
+) -> List[int]:
+    #ID проверка: HEAD без тела, GET только если сервер не знает HEAD.
+    #Останавливается, как только найдено needed ID
     existing_ids = []
-    ids_to_check = list(range(start, end + 1))
+    use_get = False
 
     #ID
     async def check_single_id(char_id: int) -> Optional[int]:
+        nonlocal use_get
+        url = f"{API_BASE_URL}/people/{char_id}"
         try:
-            url = f"{API_BASE_URL}/people/{char_id}"
-            async with session.get(url, timeout=5) as response:
-                if response.status == 200:
-                    return char_id
-                return None
-        except:
+            if not use_get:
+                async with limiter.slot() as slot, session.head(url, allow_redirects=True) as response:
+                    slot.observe(response)
+                    if response.status not in (405, 501):
+                        return char_id if response.status == 200 else None
+                use_get = True
+
+            #Тело не читаем: соединение закрывается сразу после заголовков
+            async with limiter.slot() as slot, session.get(url) as response:
+                slot.observe(response)
+                return char_id if response.status == 200 else None
+        except Exception as e:
+            logger.debug(f"Ошибка проверки ID {char_id}: {e}")
             return None
 
-    #Одновременно
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-
-    async def check_with_semaphore(char_id: int) -> Optional[int]:
-        async with semaphore:
-            return await check_single_id(char_id)
-
-    batch_size = 20
-    for i in range(0, len(ids_to_check), batch_size):
-        batch = ids_to_check[i:i + batch_size]
-        tasks = [check_with_semaphore(cid) for cid in batch]
-        results = await asyncio.gather(*tasks)
-
-        batch_existing = [cid for cid in results if cid is not None]
-        existing_ids.extend(batch_existing)
-
-        if i + batch_size < len(ids_to_check):
-            await asyncio.sleep(1)
+    #Порциями по окну лимитера, чтобы вовремя остановиться
+    position = 0
+    while position < len(ids_to_check):
+        if needed is not None and len(existing_ids) >= needed:
+            break
+        chunk = ids_to_check[position:position + max(limiter.concurrency, 1)]
+        position += len(chunk)
+        results = await asyncio.gather(*[check_single_id(cid) for cid in chunk])
+        existing_ids.extend(cid for cid in results if cid is not None)
 
     return existing_ids
 
 
-async def get_existing_ids_from_db() -> List[int]:
+async def probe_missing_ids(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter,
+        known_ids: Set[int],
+        total_records: int
+) -> List[int]:
+    #Перебор только дыр между известными ID и total_records
+    if total_records > 0:
+        needed = total_records - len(known_ids)
+        if needed <= 0:
+            return []
+        upper = max(total_records, max(known_ids, default=0)) + PROBE_MARGIN
+    else:
+        #total_records неизвестен: старый перебор диапазона, если ID подозрительно мало
+        if len(known_ids) >= PROBE_MIN_IDS:
+            return []
+        needed = None
+        upper = PROBE_MAX_ID
+
+    gaps = [cid for cid in range(1, upper + 1) if cid not in known_ids]
+    return await check_ids(session, limiter, gaps, needed)
+
+
+async def get_existing_ids_from_db(pool: ConnectionPool) -> List[int]:
     #Персонажи из базы
     try:
-        async with aiosqlite.connect("starwars_characters.db") as db:
+        async with pool.reader() as db:
             async with db.execute("SELECT id FROM characters") as cursor:
                 rows = await cursor.fetchall()
                 return [row[0] for row in rows]
-    except:
+    except aiosqlite.Error as e:
+        logger.error(f"Ошибка чтения ID из базы: {e}")
         return []
 
 
-async def get_all_available_ids(session: aiohttp.ClientSession) -> List[int]:
+async def get_all_available_ids(session: aiohttp.ClientSession, limiter: AdaptiveRateLimiter) -> List[int]:
     all_ids = set()
 
-    #Текст
-    pagination_ids = await get_all_character_ids_with_next_check(session)
+    #Текст: параллельные страницы, последовательный обход next как запасной путь
+    pagination_ids = await get_all_character_ids_fast(session, limiter)
+    if pagination_ids is None:
+        pagination_ids = await get_all_character_ids_with_next_check(session, limiter)
     all_ids.update(pagination_ids)
 
-    #Диапазон
-    if len(all_ids) < 30:
-        range_ids = await check_id_range(session, 1, 150)
-        all_ids.update(range_ids)
-
-    #из API
-    try:
-        info_url = f"{API_BASE_URL}/people?page=1"
-        async with session.get(info_url, timeout=10) as response:
-            if response.status == 200:
-                data = await response.json()
-                total_records = data.get("total_records", 0)
+    #total_records уже получен при обходе страниц
+    total_records = progress_tracker.total_api_characters
 
-                if total_records > 0:
-                    progress_tracker.total_api_characters = total_records
+    #Диапазон: только недостающие
+    range_ids = await probe_missing_ids(session, limiter, all_ids, total_records)
+    all_ids.update(range_ids)
 
-                    #Прогресс
-                    progress_tracker.show_search_progress(0, total_records)
-    except:
-        pass
+    if range_ids and total_records > 0:
+        progress_tracker.show_search_progress(len(all_ids), total_records)
 
-    result = sorted(list(all_ids))
+    result = sorted(all_ids)
     progress_tracker.found_characters = len(result)
 
     return result
 
 
-async def get_missing_ids(session: aiohttp.ClientSession) -> List[int]:
+async def get_missing_ids(
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveRateLimiter,
+        pool: ConnectionPool,
+        sync: bool = False
+) -> List[int]:
     #ID персонажей
     progress_tracker.start_stage("АНАЛИЗ БАЗЫ ДАННЫХ")
 
     #Доступные ID из API
-    api_ids = await get_all_available_ids(session)
+    api_ids = await get_all_available_ids(session, limiter)
 
     #Получаем ID
-    db_ids = await get_existing_ids_from_db()
+    db_ids = await get_existing_ids_from_db(pool)
 
-    #Поиск недостающего
+    #Поиск недостающего; при синхронизации проверяем все ID условными запросами
     db_ids_set = set(db_ids)
-    missing_ids = [cid for cid in api_ids if cid not in db_ids_set]
+    if sync:
+        missing_ids = list(api_ids)
+    else:
+        missing_ids = [cid for cid in api_ids if cid not in db_ids_set]
 
     progress_tracker.existing_in_db = len(db_ids)
     progress_tracker.missing_characters = len(missing_ids)
@@ -350,297 +785,709 @@ async def get_missing_ids(session: aiohttp.ClientSession) -> List[int]:
     return missing_ids
 
 
+def clean_text(value: Optional[str], default: str = "Unknown") -> str:
+    #Пустое или отсутствующее поле - значение по умолчанию
+    return (value.strip() or default) if value else default
+
+
 async def fetch_character_full_data(
         session: aiohttp.ClientSession,
         character_id: int,
         cache: ResourceCache,
-        semaphore: asyncio.Semaphore
-) -> Optional[Dict]:
-    #Загрузка данных
+        limiter: AdaptiveRateLimiter,
+        validators: Optional[Tuple[Optional[str], Optional[str], Optional[str]]] = None
+):
+    #Загрузка данных. validators = (etag, last_modified, content_hash) из базы:
+    #если запись не изменилась, возвращается UNCHANGED
     url = f"{API_BASE_URL}/people/{character_id}"
+    max_retries = 3
+    props = None
+    last_error = "нет ответа"
+    etag, last_modified, known_hash = validators or (None, None, None)
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    #Слот лимитера держим только на время запроса персонажа,
+    #связанные сущности идут через тот же лимитер отдельно
+    for attempt in range(max_retries):
+        try:
+            async with limiter.slot() as slot, session.get(
+                    url, headers=headers, trace_request_ctx={"attempt": attempt}
+            ) as response:
+                slot.observe(response)
+                if response.status == 304 and validators:
+                    return UNCHANGED
 
-    # Нагрузка
-    async with semaphore:
-        for attempt in range(3):
-            try:
-                async with session.get(url, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-
-                        if "result" not in data or "properties" not in data["result"]:
-                            return None
-
-                        props = data["result"]["properties"]
-
-                        # Получаем название родной планеты
-                        homeworld_url = props.get("homeworld")
-                        homeworld_name = await cache.get_name(session, homeworld_url, "planets")
-
-                        # Получаем названия связанных сущностей через запятую
-                        films = await cache.get_names_from_urls(session, props.get("films", []), "films")
-                        species = await cache.get_names_from_urls(session, props.get("species", []), "species")
-                        starships = await cache.get_names_from_urls(session, props.get("starships", []), "starships")
-                        vehicles = await cache.get_names_from_urls(session, props.get("vehicles", []), "vehicles")
-
-                        character = {
-                            "id": character_id,
-                            "name": props.get("name", "").strip() or f"Character {character_id}",
-                            "birth_year": props.get("birth_year", "").strip() or "Unknown",
-                            "eye_color": props.get("eye_color", "").strip() or "Unknown",
-                            "gender": props.get("gender", "").strip() or "Unknown",
-                            "hair_color": props.get("hair_color", "").strip() or "Unknown",
-                            "homeworld_name": homeworld_name,
-                            "mass": props.get("mass", "").strip() or "Unknown",
-                            "skin_color": props.get("skin_color", "").strip() or "Unknown",
-                            "films": films,
-                            "species": species,
-                            "starships": starships,
-                            "vehicles": vehicles,
-                        }
-
-                        return character
+                if response.status == 200:
+                    #Сразу в типизированную структуру, без промежуточных словарей
+                    props = decode_person(await response.read())
+                    if props is None:
+                        return FetchFailure("ответ без result.properties", permanent=True)
 
-                    elif response.status == 404:
-                        return None
-                    else:
-                        if attempt < 2:
-                            await asyncio.sleep(1)
-                            continue
-                        return None
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    break
 
-            except asyncio.TimeoutError:
-                if attempt < 2:
-                    await asyncio.sleep(2)
-                    continue
-                return None
-            except Exception:
-                if attempt < 2:
-                    await asyncio.sleep(1)
-                    continue
-                return None
+                elif response.status == 404:
+                    return FetchFailure("HTTP 404", permanent=True)
 
-    return None
+                last_error = f"HTTP {response.status}"
+
+        except Exception as e:
+            last_error = f"{type(e).__name__}: {e}"
 
+        if attempt == max_retries - 1:
+            return FetchFailure(last_error)
+        await limiter.backoff(attempt)
 
-async def save_character_full(db: aiosqlite.Connection, character: Dict) -> bool:
-    #Сохранение персонажей
+    if props is None:
+        return FetchFailure(last_error)
+
+    #Разбор полей и связей - под обработчиком: кривые данные одного ID
+    #дают неудачу этого ID, а не исключение в воркере
     try:
-        await db.execute("""
-            INSERT OR REPLACE INTO characters 
-            (id, name, birth_year, eye_color, gender, hair_color, homeworld_name, 
-             mass, skin_color, films, species, starships, vehicles)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            character["id"],
-            character["name"],
-            character["birth_year"],
-            character["eye_color"],
-            character["gender"],
-            character["hair_color"],
-            character["homeworld_name"],
-            character["mass"],
-            character["skin_color"],
-            character["films"],
-            character["species"],
-            character["starships"],
-            character["vehicles"],
-        ))
+        #Сервер без ETag: сравниваем хэш содержимого
+        props_hash = content_hash(props)
+        if known_hash and props_hash == known_hash:
+            return UNCHANGED
+
+        # Получаем название родной планеты
+        homeworld_name = await cache.get_name(session, props.homeworld, "planets")
+
+        # Связанные сущности: uid для таблиц связей и названия через запятую
+        relations = {}
+        for resource_type in RELATION_TYPES:
+            relations[resource_type] = await cache.get_entities_from_urls(
+                session, getattr(props, resource_type), resource_type
+            )
+
+        films, species, starships, vehicles = (
+            ", ".join(name for _, name in relations[resource_type]) for resource_type in RELATION_TYPES
+        )
+
+        return Character(
+            id=character_id,
+            name=clean_text(props.name, f"Character {character_id}"),
+            birth_year=clean_text(props.birth_year),
+            eye_color=clean_text(props.eye_color),
+            gender=clean_text(props.gender),
+            hair_color=clean_text(props.hair_color),
+            homeworld_name=homeworld_name,
+            mass=clean_text(props.mass),
+            skin_color=clean_text(props.skin_color),
+            films=films,
+            species=species,
+            starships=starships,
+            vehicles=vehicles,
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=props_hash,
+            relations=relations,
+        )
+    except ResourceFetchError as e:
+        return FetchFailure(str(e))
+    #Окончательно - только ошибки разбора полей; сетевые и прочие получают повторы
+    except (TypeError, AttributeError, ValueError) as e:
+        return FetchFailure(f"некорректные данные: {type(e).__name__}: {e}", permanent=True)
+    except Exception as e:
+        return FetchFailure(f"{type(e).__name__}: {e}")
+
+
+INSERT_CHARACTER_SQL = f"""
+    INSERT OR REPLACE INTO characters ({", ".join(CHARACTER_COLUMNS)})
+    VALUES ({", ".join("?" * len(CHARACTER_COLUMNS))})
+"""
+
+
+MARK_JOB_DONE_SQL = """
+    UPDATE load_jobs SET status = 'done', last_error = NULL, updated_at = ?
+    WHERE id = ?
+"""
+
+
+async def save_character_full(db: aiosqlite.Connection, character: Character) -> bool:
+    #Сохранение персонажей; задание закрывается в той же транзакции
+    try:
+        await db.execute(INSERT_CHARACTER_SQL, character.as_row())
+        if character.relations is not None:
+            await save_relations(db, {character.id: character.relations})
+        await db.execute(MARK_JOB_DONE_SQL, (time.time(), character.id))
         await db.commit()
         return True
     except Exception as e:
-        logger.error(f"Ошибка сохранения ID {character['id']}: {e}")
+        #Недописанные строки этого персонажа не должны уйти в коммит следующего
+        await db.rollback()
+        logger.error(f"Ошибка сохранения ID {character.id}: {e}")
         return False
 
 
-async def create_table_full(db: aiosqlite.Connection):
-    #Таблица
+async def save_characters_batch(
+        db: aiosqlite.Connection,
+        characters: List[Character],
+        failures: Optional[List[Tuple[int, FetchFailure]]] = None
+) -> int:
+    #Пакетное сохранение: один executemany в одной транзакции.
+    #failures - (id, FetchFailure) для строк, не сохранившихся и построчно
+    characters = [c for c in characters if c]
+    if not characters:
+        return 0
+
     try:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS characters (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                birth_year TEXT,
-                eye_color TEXT,
-                gender TEXT,
-                hair_color TEXT,
-                homeworld_name TEXT,
-                mass TEXT,
-                skin_color TEXT,
-                films TEXT,
-                species TEXT,
-                starships TEXT,
-                vehicles TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        await db.executemany(INSERT_CHARACTER_SQL, [c.as_row() for c in characters])
+        await save_relations(db, {c.id: c.relations for c in characters if c.relations is not None})
+        now = time.time()
+        await db.executemany(MARK_JOB_DONE_SQL, [(now, c.id) for c in characters])
+        await db.commit()
+        return len(characters)
+    except Exception as e:
+        logger.warning(f"Ошибка пакетного сохранения ({len(characters)} шт.), построчно: {e}")
+        await db.rollback()
 
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_name ON characters(name)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_homeworld ON characters(homeworld_name)")
+    #Построчно только при ошибке пакета
+    saved = 0
+    for character in characters:
+        if await save_character_full(db, character):
+            saved += 1
+        elif failures is not None:
+            failures.append((character.id, FetchFailure("ошибка сохранения в БД")))
+    return saved
 
-        await db.commit()
+
+async def create_table_full(db: aiosqlite.Connection):
+    #Таблица: общая схема с migrate_db.py, недостающие шаги миграций применяются на месте
+    try:
+        await migrate(db)
     except Exception as e:
         logger.error(f"Ошибка создания таблицы: {e}")
         raise
 
 
-async def load_missing_characters():
-    #Недостающие
-    progress_tracker.start_stage("ЗАГРУЗКА ПЕРСОНАЖЕЙ")
+async def enqueue_jobs(db: aiosqlite.Connection, ids: List[int], retry_dead: bool = False):
+    #Новые ID - в pending; завершенные снова в pending. У упавших сохраняются
+    #попытки и график повторов, отброшенные (dead) - только при retry_dead
+    statuses = "('done', 'dead')" if retry_dead else "('done')"
+    await db.executemany(f"""
+        INSERT INTO load_jobs (id, status, updated_at) VALUES (?, 'pending', ?)
+        ON CONFLICT(id) DO UPDATE SET status = 'pending', attempts = 0, last_error = NULL
+        WHERE status IN {statuses}
+    """, [(cid, time.time()) for cid in ids])
+    await db.commit()
 
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
-    #Кэш
-    cache = ResourceCache()
+async def get_pending_job_ids(db: aiosqlite.Connection) -> List[int]:
+    #Незавершенные задания прошлого запуска
+    async with db.execute("SELECT id FROM load_jobs WHERE status = 'pending' ORDER BY id") as cursor:
+        return [row[0] async for row in cursor]
 
-    timeout = aiohttp.ClientTimeout(total=300, connect=30, sock_read=60)
 
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        #Поиск
-        missing_ids = await get_missing_ids(session)
+async def get_runnable_job_ids(db: aiosqlite.Connection) -> List[int]:
+    #pending и упавшие, у которых подошло время повтора
+    async with db.execute("""
+        SELECT id FROM load_jobs
+        WHERE status = 'pending' OR (status = 'failed' AND next_retry_at <= ?)
+        ORDER BY id
+    """, (time.time(),)) as cursor:
+        return [row[0] async for row in cursor]
 
-        if not missing_ids:
-            progress_tracker.end_stage()
-            return 0, 0
 
-        #Начало
-        progress_tracker.show_loading_progress(0, len(missing_ids))
+async def record_job_results(db: aiosqlite.Connection, results: List[Tuple[int, object]]):
+    #Ошибки с экспоненциальной задержкой, UNCHANGED - как выполненные
+    now = time.time()
+    try:
+        for char_id, result in results:
+            if result is UNCHANGED:
+                await db.execute(MARK_JOB_DONE_SQL, (now, char_id))
+                continue
+
+            async with db.execute("SELECT attempts FROM load_jobs WHERE id = ?", (char_id,)) as cursor:
+                row = await cursor.fetchone()
+            attempts = (row[0] if row else 0) + 1
+            dead = result.permanent or attempts >= JOB_MAX_ATTEMPTS
+            delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (attempts - 1))
+
+            await db.execute("""
+                INSERT INTO load_jobs (id, status, attempts, last_error, next_retry_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = excluded.attempts,
+                    last_error = excluded.last_error,
+                    next_retry_at = excluded.next_retry_at,
+                    updated_at = excluded.updated_at
+            """, (char_id, "dead" if dead else "failed", attempts, result.reason, now + delay, now))
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Ошибка записи состояния заданий: {e}")
+
 
-        async with aiosqlite.connect("starwars_characters.db") as db:
-            await create_table_full(db)
+async def load_sync_validators(db: aiosqlite.Connection) -> Dict[int, Tuple]:
+    #ETag/Last-Modified/хэш сохраненных персонажей
+    async with db.execute("SELECT id, etag, last_modified, content_hash FROM characters") as cursor:
+        return {row[0]: row[1:] async for row in cursor}
 
-            total_saved = 0
 
-            batch_size = 10
-            batches = [missing_ids[i:i + batch_size] for i in range(0, len(missing_ids), batch_size)]
+async def fetch_worker(
+        session: aiohttp.ClientSession,
+        cache: ResourceCache,
+        limiter: AdaptiveRateLimiter,
+        id_queue: asyncio.Queue,
+        result_queue: asyncio.Queue,
+        validators: Dict[int, Tuple]
+):
+    #Воркер загрузки: берет ID из очереди, отдает результат писателю
+    while True:
+        char_id = await id_queue.get()
+        try:
+            if char_id is None:
+                return
+            metrics.QUEUE_DEPTH.set(id_queue.qsize(), queue="ids")
+            #Любая ошибка - неудача этого ID, а не смерть воркера
+            try:
+                character = await fetch_character_full_data(
+                    session, char_id, cache, limiter, validators.get(char_id)
+                )
+            except Exception as e:
+                character = FetchFailure(f"{type(e).__name__}: {e}")
+            if character is UNCHANGED:
+                progress_tracker.unchanged_characters += 1
+                metrics.CHARACTERS.inc(result="unchanged")
+            elif not character:
+                metrics.CHARACTERS.inc(result="failed")
+                logger.warning(f"Не удалось загрузить ID {char_id}: {character.reason}")
+            await result_queue.put((char_id, character))
+        finally:
+            id_queue.task_done()
+
+
+async def db_writer(
+        db: aiosqlite.Connection,
+        result_queue: asyncio.Queue,
+        total: int,
+        write_times: Optional[List[float]] = None
+) -> int:
+    #Писатель БД: копит результаты до DB_BATCH_SIZE или DB_FLUSH_INTERVAL сек.
+    #write_times - длительность записи каждой пачки, для бенчмарков
+    loop = asyncio.get_running_loop()
+    total_saved = 0
+    buffer = []
+    job_results = []
+    flush_at = 0.0
+    done = False
+
+    while not done:
+        pending = len(buffer) + len(job_results)
+        timeout = max(0.0, flush_at - loop.time()) if pending else None
+        try:
+            item = await asyncio.wait_for(result_queue.get(), timeout)
+            if item is None:
+                done = True
+            else:
+                if not pending:
+                    flush_at = loop.time() + DB_FLUSH_INTERVAL
+                char_id, result = item
+                if result and result is not UNCHANGED:
+                    buffer.append(result)
+                else:
+                    job_results.append(item)
+        except asyncio.TimeoutError:
+            pass
 
-            for batch_num, batch in enumerate(batches, 1):
-                tasks = []
-                for char_id in batch:
-                    task = fetch_character_full_data(session, char_id, cache, semaphore)
-                    tasks.append(task)
+        pending = len(buffer) + len(job_results)
+        if pending and (done or pending >= DB_BATCH_SIZE or loop.time() >= flush_at):
+            metrics.QUEUE_DEPTH.set(result_queue.qsize(), queue="results")
+            if job_results:
+                with metrics.DB_JOB_SECONDS.time():
+                    await record_job_results(db, job_results)
+                job_results = []
+            if buffer:
+                write_started = time.perf_counter()
+                failures = []
+                saved = await save_characters_batch(db, buffer, failures)
+                write_time = time.perf_counter() - write_started
+                #Несохраненные - обычные неудачи: попытки и задержка, а не вечный pending
+                if failures:
+                    metrics.CHARACTERS.inc(len(failures), result="failed")
+                    with metrics.DB_JOB_SECONDS.time():
+                        await record_job_results(db, failures)
+                total_saved += saved
+                metrics.DB_BATCH_SECONDS.observe(write_time)
+                metrics.DB_BATCH_ROWS.observe(len(buffer))
+                metrics.CHARACTERS.inc(saved, result="saved")
+                if write_times is not None:
+                    write_times.append(write_time)
+                buffer = []
+                progress_tracker.loaded_characters = total_saved
+                progress_tracker.show_loading_progress(total_saved, total)
+
+    return total_saved
+
+
+async def wait_unless_writer_failed(awaitable, writer: asyncio.Task):
+    #Ожидание с проверкой писателя БД: если он упал, его исключение вместо вечной блокировки
+    task = asyncio.ensure_future(awaitable)
+    await asyncio.wait({task, writer}, return_when=asyncio.FIRST_COMPLETED)
+    if not task.done():
+        task.cancel()
+        writer.result()
+        raise RuntimeError("Писатель БД завершился до окончания загрузки")
+    return task.result()
+
+
+async def put_checked(queue: asyncio.Queue, item, writer: asyncio.Task):
+    if queue.full():
+        await wait_unless_writer_failed(queue.put(item), writer)
+    else:
+        queue.put_nowait(item)
+
+
+def create_http_session(
+        record_path: Optional[str] = None,
+        replay_path: Optional[str] = None,
+        replay_latency: float = 0.0,
+        replay_error_rate: float = 0.0,
+        http2: bool = False
+):
+    #HTTP-сессия: сеть, сеть с записью ответов или воспроизведение записи без сети.
+    #Пул соединений на хост - под максимальное окно лимитера
+    if replay_path:
+        return ReplaySession.from_file(replay_path, latency=replay_latency, error_rate=replay_error_rate)
+
+    session = create_client_session(
+        MAX_CONCURRENT_REQUESTS,
+        trace_configs=[request_tracer.trace_config()],
+        http2=http2
+    )
+    if record_path:
+        return RecordingSession(session, record_path, API_BASE_URL)
+    return session
+
+
+async def load_missing_characters(
+        pool: ConnectionPool,
+        sync: bool = False,
+        session_factory: Optional[Callable] = None,
+        stats: Optional[Dict] = None,
+        retry_dead: bool = False
+):
+    #Недостающие; в stats (если передан) - счетчики лимитера, кэша и времени записи
+    progress_tracker.start_stage("ЗАГРУЗКА ПЕРСОНАЖЕЙ")
 
-                characters = await asyncio.gather(*tasks)
+    #Общий лимитер запросов
+    limiter = create_rate_limiter()
 
-                #Сохранение
-                batch_saved = 0
-                for character in characters:
-                    if character:
-                        if await save_character_full(db, character):
-                            total_saved += 1
-                            batch_saved += 1
-                            progress_tracker.loaded_characters = total_saved
+    #Кэш
+    cache = ResourceCache(limiter)
 
-                progress_tracker.show_loading_progress(
-                    total_saved,
-                    len(missing_ids)
-                )
+    write_times = []
+    if stats is not None:
+        stats["limiter"] = limiter
+        stats["cache"] = cache
+        stats["write_times"] = write_times
 
-                if batch_num < len(batches):
-                    await asyncio.sleep(2)
+    async with (session_factory or create_http_session)() as session:
+        async with pool.writer() as db:
+            await create_table_full(db)
 
-            progress_tracker.end_stage()
-            return total_saved, len(missing_ids)
+            #Прерванный запуск продолжаем по таблице заданий, без повторного поиска
+            pending_ids = [] if sync else await get_pending_job_ids(db)
+            if pending_ids:
+                print(f"\nВОЗОБНОВЛЕНИЕ: {len(pending_ids)} незавершенных заданий")
+            else:
+                #Поиск
+                missing_ids = await get_missing_ids(session, limiter, pool, sync)
+                await enqueue_jobs(db, missing_ids, retry_dead)
 
+            work_ids = await get_runnable_job_ids(db)
 
-async def show_final_report():
-    #Отчетность
-    progress_tracker.start_stage("ФИНАЛЬНАЯ СТАТИСТИКА")
+            if not work_ids:
+                progress_tracker.end_stage()
+                return 0, 0
 
-    try:
-        async with aiosqlite.connect("starwars_characters.db") as db:
-            #Статистика
-            async with db.execute("SELECT COUNT(*) FROM characters") as cursor:
-                total = await cursor.fetchone()
-                progress_tracker.total_in_db = total[0]
-                print(f"\nВСЕГО ПЕРСОНАЖЕЙ В БАЗЕ: {total[0]}")
-
-            if total[0] > 0:
-                # ID
-                async with db.execute("SELECT MIN(id), MAX(id) FROM characters") as cursor:
-                    min_max = await cursor.fetchone()
-                    print(f"Диапазон ID: {min_max[0]} - {min_max[1]}")
-
-                # Примеры данных
-                print("\nПРИМЕРЫ ДАННЫХ С НОВЫМИ ПОЛЯМИ:")
-                print("-" * 100)
-
-                async with db.execute("""
-                    SELECT name, homeworld_name, films, species, starships 
-                    FROM characters 
-                    WHERE films != '' OR species != '' OR starships != ''
-                    ORDER BY RANDOM()
-                    LIMIT 3
-                """) as cursor:
-                    examples = await cursor.fetchall()
-                    if examples:
-                        for ex in examples:
-                            print(f"\n{ex[0]}:")
-                            print(f"Планета: {ex[1]}")
-                            if ex[2]:
-                                print(f"Фильмы: {ex[2]}")
-                            if ex[3]:
-                                print(f"Виды: {ex[3]}")
-                            if ex[4]:
-                                print(f"Звездолеты: {ex[4]}")
-                    else:
-                        print("  Нет данных в новых полях (возможно API не возвращает их)")
-
-            # Проверка целостности данных
-            print("\nПРОВЕРКА ЦЕЛОСТНОСТИ ДАННЫХ:")
-            print("-" * 100)
-
-            checks = [
-                ("Персонажей в базе", "SELECT COUNT(*) FROM characters"),
-                ("С уникальными именами", "SELECT COUNT(DISTINCT name) FROM characters"),
-                ("С известными планетами", "SELECT COUNT(*) FROM characters WHERE homeworld_name != 'Unknown'"),
-                ("Со связанными сущностями",
-                 "SELECT COUNT(*) FROM characters WHERE films != '' OR species != '' OR starships != '' OR vehicles != ''"),
+            #Начало
+            progress_tracker.show_loading_progress(0, len(work_ids))
+
+            await cache.load(db)
+            validators = await load_sync_validators(db) if sync else {}
+
+            #Справочники пачкой; одиночные запросы остаются для промахов
+            await cache.prefetch(session)
+
+            #Ограниченные очереди дают обратное давление вместо пауз
+            id_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            result_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+            writer = asyncio.create_task(db_writer(db, result_queue, len(work_ids), write_times))
+            workers = [
+                asyncio.create_task(fetch_worker(session, cache, limiter, id_queue, result_queue, validators))
+                for _ in range(FETCH_WORKERS)
             ]
 
-            for check_name, query in checks:
-                async with db.execute(query) as cursor:
-                    count = await cursor.fetchone()
-                    print(f"  {check_name:25}: {count[0]}")
+            try:
+                for char_id in work_ids:
+                    await put_checked(id_queue, char_id, writer)
+                for _ in workers:
+                    await put_checked(id_queue, None, writer)
+                await wait_unless_writer_failed(asyncio.gather(*workers), writer)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                #Упавшему писателю сигнал не нужен: очередь может быть полна
+                if not writer.done():
+                    await result_queue.put(None)
+                try:
+                    total_saved = await writer
+                finally:
+                    await cache.save(db)
+                    request_tracer.flush()
 
             progress_tracker.end_stage()
-            progress_tracker.show_final_summary()
+            return total_saved, len(work_ids)
+
+
+async def sample_characters(db: aiosqlite.Connection, min_id: int, max_id: int, count: int) -> List[Dict]:
+    #Случайные примеры поиском по первичному ключу вместо ORDER BY RANDOM()
+    samples = {}
+    for _ in range(count * REPORT_SAMPLE_ATTEMPTS):
+        if len(samples) >= count:
+            break
+        async with db.execute("""
+            SELECT id, name, homeworld_name, films, species, starships
+            FROM characters
+            WHERE id >= ? AND (films != '' OR species != '' OR starships != '')
+            ORDER BY id
+            LIMIT 1
+        """, (random.randint(min_id, max_id),)) as cursor:
+            row = await cursor.fetchone()
+        if row and row[0] not in samples:
+            samples[row[0]] = {
+                "id": row[0],
+                "name": row[1],
+                "homeworld_name": row[2],
+                "films": row[3],
+                "species": row[4],
+                "starships": row[5],
+            }
+    return list(samples.values())
+
+
+async def collect_report(db: aiosqlite.Connection) -> Dict:
+    #Вся статистика одним проходом по таблице
+    async with db.execute("""
+        SELECT
+            COUNT(*),
+            MIN(id),
+            MAX(id),
+            COUNT(DISTINCT name),
+            SUM(CASE WHEN homeworld_name != 'Unknown' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN films != '' OR species != '' OR starships != '' OR vehicles != ''
+                THEN 1 ELSE 0 END)
+        FROM characters
+    """) as cursor:
+        total, min_id, max_id, unique_names, known_homeworld, with_relations = await cursor.fetchone()
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "total": total,
+        "min_id": min_id,
+        "max_id": max_id,
+        "unique_names": unique_names,
+        "known_homeworld": known_homeworld or 0,
+        "with_relations": with_relations or 0,
+        "samples": [],
+    }
+
+    if total:
+        report["samples"] = await sample_characters(db, min_id, max_id, REPORT_SAMPLES)
+
+    return report
+
+
+async def show_final_report(pool: ConnectionPool, json_path: Optional[str] = None):
+    #Отчетность; json_path - еще и машиночитаемый отчет ("-" - только JSON в stdout)
+    json_only = json_path == "-"
+    if not json_only:
+        progress_tracker.start_stage("ФИНАЛЬНАЯ СТАТИСТИКА")
 
+    try:
+        async with pool.reader() as db:
+            report = await collect_report(db)
     except Exception as e:
         print(f"Ошибка при создании отчета: {e}")
         progress_tracker.end_stage()
+        return None
+
+    progress_tracker.total_in_db = report["total"]
+
+    if json_path:
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if json_only:
+            print(text)
+            return report
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    #Статистика
+    print(f"\nВСЕГО ПЕРСОНАЖЕЙ В БАЗЕ: {report['total']}")
+
+    if report["total"] > 0:
+        # ID
+        print(f"Диапазон ID: {report['min_id']} - {report['max_id']}")
+
+        # Примеры данных
+        print("\nПРИМЕРЫ ДАННЫХ С НОВЫМИ ПОЛЯМИ:")
+        print("-" * 100)
+
+        if report["samples"]:
+            for ex in report["samples"]:
+                print(f"\n{ex['name']}:")
+                print(f"Планета: {ex['homeworld_name']}")
+                if ex["films"]:
+                    print(f"Фильмы: {ex['films']}")
+                if ex["species"]:
+                    print(f"Виды: {ex['species']}")
+                if ex["starships"]:
+                    print(f"Звездолеты: {ex['starships']}")
+        else:
+            print("  Нет данных в новых полях (возможно API не возвращает их)")
+
+    # Проверка целостности данных
+    print("\nПРОВЕРКА ЦЕЛОСТНОСТИ ДАННЫХ:")
+    print("-" * 100)
+
+    checks = [
+        ("Персонажей в базе", report["total"]),
+        ("С уникальными именами", report["unique_names"]),
+        ("С известными планетами", report["known_homeworld"]),
+        ("Со связанными сущностями", report["with_relations"]),
+    ]
+
+    for check_name, count in checks:
+        print(f"  {check_name:25}: {count}")
 
-
-async def main():
+    progress_tracker.end_stage()
+    progress_tracker.show_final_summary()
+    return report
+
+
+async def main(
+        sync: bool = False,
+        report_only: bool = False,
+        json_path: Optional[str] = None,
+        session_factory: Optional[Callable] = None,
+        metrics_path: Optional[str] = None,
+        metrics_port: Optional[int] = None,
+        retry_dead: bool = False
+):
+
+    #Только отчет - для мониторинга после загрузки
+    if report_only:
+        async with ConnectionPool(readers=1) as pool:
+            await show_final_report(pool, json_path)
+        return
 
     print("=" * 100)
-    print("ЗАГРУЗКА ДАННЫХ")
+    print("СИНХРОНИЗАЦИЯ ДАННЫХ" if sync else "ЗАГРУЗКА ДАННЫХ")
     print("=" * 70)
 
+    #Метрики: /metrics на время работы и файл по завершении (даже при ошибке)
+    metrics_runner = await metrics.registry.serve(port=metrics_port) if metrics_port else None
+    try:
+        #Одни соединения с БД на все этапы
+        async with ConnectionPool() as pool:
+            await run_stages(pool, sync, json_path, session_factory, retry_dead)
+    finally:
+        if metrics_path:
+            metrics.registry.write(metrics_path)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+    print("\n" + "=" * 100)
+    print("ПРОГРАММА ЗАВЕРШЕНА!")
+    print("=" * 100)
+
+
+async def run_stages(
+        pool: ConnectionPool,
+        sync: bool = False,
+        json_path: Optional[str] = None,
+        session_factory: Optional[Callable] = None,
+        retry_dead: bool = False
+):
     #Загрузка
-    saved, total = await load_missing_characters()
+    saved, total = await load_missing_characters(pool, sync, session_factory, retry_dead=retry_dead)
 
     if saved > 0:
-        print(f"\nЗагружено {saved} новых персонажей из {total} недостающих")
+        if sync:
+            print(f"\nОбновлено {saved} персонажей из {total} проверенных")
+        else:
+            print(f"\nЗагружено {saved} новых персонажей из {total} недостающих")
 
     print("\n" + "=" * 100)
 
     #Результат
-    await show_final_report()
-
-    print("\n" + "=" * 100)
-    print("ПРОГРАММА ЗАВЕРШЕНА!")
-    print("=" * 100)
+    await show_final_report(pool, json_path)
 
 
 if __name__ == "__main__":
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Загрузка персонажей Star Wars')
+    parser.add_argument('--sync', action='store_true',
+                        help='Инкрементальная синхронизация: перепроверить всех, обновить только измененных')
+    parser.add_argument('--retry-dead', action='store_true',
+                        help=f'Повторить отброшенные задания (после {JOB_MAX_ATTEMPTS} попыток или 404)')
+    parser.add_argument('--report', action='store_true', help='Только отчет по базе, без загрузки')
+    parser.add_argument('--json', metavar='FILE', help='Сохранить отчет в JSON ("-" - вывести только JSON)')
+    parser.add_argument('--record', metavar='FILE', help='Записать все ответы API в FILE (gzip JSONL)')
+    parser.add_argument('--replay', metavar='FILE', help='Работать без сети на ответах из FILE')
+    parser.add_argument('--replay-latency', type=float, default=0.0, help='Задержка ответа при --replay, сек')
+    parser.add_argument('--replay-error-rate', type=float, default=0.0,
+                        help='Доля ответов 503 при --replay (0..1)')
+    parser.add_argument('--api-url',
+                        help='Базовый URL API (например, локальный mock_server.py); при --replay - из записи')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Сохранить метрики: FILE.prom - формат Prometheus, иначе JSON')
+    parser.add_argument('--metrics-port', type=int, help='Отдавать метрики Prometheus на :PORT/metrics')
+    parser.add_argument('--http2', action='store_true', help='HTTP/2 через httpx (нужен httpx[http2])')
+    parser.add_argument('--trace', metavar='FILE', help='Спаны всех запросов к API в FILE (JSONL)')
+    parser.add_argument('--trace-otel', action='store_true',
+                        help='Спаны в OpenTelemetry (нужен opentelemetry-api и настроенный экспортер)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Уровень логирования (по умолчанию LOG_LEVEL или WARNING)')
+
+    args = parser.parse_args()
+    if args.api_url:
+        API_BASE_URL = args.api_url.rstrip('/')
+    elif args.replay:
+        API_BASE_URL = FixtureStore.read_base_url(args.replay) or API_BASE_URL
+    if args.log_level:
+        logging.getLogger().setLevel(args.log_level)
+    if args.trace:
+        request_tracer.sinks.append(JsonlSink(args.trace))
+    if args.trace_otel:
+        request_tracer.sinks.append(OpenTelemetrySink())
+
     try:
-        asyncio.run(main())
+        def session_factory():
+            return create_http_session(
+                args.record, args.replay, args.replay_latency, args.replay_error_rate, args.http2
+            )
+
+        asyncio.run(main(
+            args.sync, args.report, args.json, session_factory, args.metrics, args.metrics_port, args.retry_dead
+        ))
     except KeyboardInterrupt:
         print("\nПрервано пользователем")
         progress_tracker.end_stage()
     except Exception as e:
         print(f"\nКритическая ошибка: {e}")
-        progress_tracker.end_stage()
\ No newline at end of file
+        progress_tracker.end_stage()
+    finally:
+        request_tracer.close()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import bisect
+import json
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+#Метрики загрузки: счетчики, значения и гистограммы с метками.
+#Экспорт - JSON-сводка или текстовый формат Prometheus (файл или /metrics)
+
+#Границы гистограмм задержек, сек
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+#Границы гистограмм размеров (строк в пачке и т.п.)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def _label_name(self, key: Tuple[str, ...]) -> str:
+        #Ключ в JSON-сводке: "" без меток, иначе "a=1,b=2"
+        return ",".join(f"{name}={value}" for name, value in zip(self.labels, key))
+
+    def reset(self):
+        #Нечего сбрасывать; значения хранят подклассы
+        pass
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def reset(self):
+        self.values.clear()
+
+    def summary(self) -> Dict:
+        return {self._label_name(key): value for key, value in sorted(self.values.items())}
+
+    def prometheus_lines(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {format_value(value)}"
+                for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        #ключ меток -> [счетчики по корзинам + переполнение, сумма, количество, максимум]
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+        series[3] = max(series[3], value)
+
+    def time(self, **labels) -> "Timer":
+        return Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def reset(self):
+        self.series.clear()
+
+    def quantile(self, key: Tuple[str, ...], q: float) -> float:
+        #Оценка квантиля линейной интерполяцией внутри корзины
+        counts, _, count, maximum = self.series[key]
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else maximum
+                return min(maximum, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return maximum
+
+    def summary(self) -> Dict:
+        result = {}
+        for key, (_, total, count, maximum) in sorted(self.series.items()):
+            result[self._label_name(key)] = {
+                "count": count,
+                "sum": round(total, 6),
+                "avg": round(total / count, 6) if count else 0.0,
+                "p50": round(self.quantile(key, 0.50), 6),
+                "p95": round(self.quantile(key, 0.95), 6),
+                "p99": round(self.quantile(key, 0.99), 6),
+                "max": round(maximum, 6),
+            }
+        return result
+
+    def prometheus_lines(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count, _) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._label_text(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class Timer:
+    #with histogram.time(): ... - длительность блока в гистограмму
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def summary(self) -> Dict:
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "metrics": {name: metric.summary() for name, metric in self.metrics.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        #.prom - текстовый формат Prometheus (для node_exporter textfile), иначе JSON
+        if path.endswith(".prom"):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.summary(), ensure_ascii=False, indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        #HTTP /metrics на время загрузки; возвращает runner для cleanup()
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+#Общий реестр процесса
+registry = MetricsRegistry()
+
+#HTTP
+HTTP_REQUESTS = registry.counter("swapi_http_requests_total", "Ответы API по коду статуса", ["status"])
+HTTP_LATENCY = registry.histogram("swapi_http_request_seconds", "Длительность запроса к API", ["status"])
+HTTP_WAIT = registry.histogram("swapi_http_wait_seconds", "Ожидание места в окне и токена лимитера")
+HTTP_RETRIES = registry.counter("swapi_http_retries_total", "Повторы запросов после ошибок")
+HTTP_IN_FLIGHT = registry.gauge("swapi_http_in_flight", "Запросов в полете")
+LIMITER_WINDOW = registry.gauge("swapi_limiter_window", "Окно одновременных запросов лимитера")
+LIMITER_RATE = registry.gauge("swapi_limiter_rate", "Темп лимитера, запросов/сек")
+
+#Кэш ресурсов
+CACHE_LOOKUPS = registry.counter("swapi_cache_lookups_total", "Обращения к кэшу ресурсов", ["result"])
+CACHE_FETCHES = registry.counter("swapi_cache_fetches_total", "Запросы ресурсов при промахах", ["result"])
+PREFETCH_PAGES = registry.counter("swapi_prefetch_pages_total", "Страницы предзагрузки справочников", ["result"])
+
+#Поиск ID
+DISCOVERY_FAILURES = registry.counter(
+    "swapi_discovery_failures_total", "Неудачные запросы страниц списка персонажей", ["result"]
+)
+
+#Конвейер и БД
+CHARACTERS = registry.counter("swapi_characters_total", "Обработанные персонажи", ["result"])
+QUEUE_DEPTH = registry.gauge("swapi_queue_depth", "Длина очереди конвейера", ["queue"])
+DB_BATCH_SECONDS = registry.histogram("swapi_db_batch_seconds", "Запись пачки персонажей с коммитом")
+DB_BATCH_ROWS = registry.histogram("swapi_db_batch_rows", "Персонажей в пачке записи", buckets=SIZE_BUCKETS)
+DB_JOB_SECONDS = registry.histogram("swapi_db_job_update_seconds", "Запись результатов заданий")
+
+#Этапы
+STAGE_SECONDS = registry.gauge("swapi_stage_seconds", "Длительность этапа", ["stage"])
+
+
+def cache_hit_ratio() -> Optional[float]:
+    lookups = CACHE_LOOKUPS.total()
+    return CACHE_LOOKUPS.value(result="hit") / lookups if lookups else None
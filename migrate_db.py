@@ -1,7 +1,13 @@
 import asyncio
-import aiosqlite
 import logging
 import sys
+from typing import Dict, Optional
+
+from db import connect
+
+from schema import (
+    RELATION_TYPES, SCHEMA_VERSION, get_schema_version, join_table, migrate, uid_from_url
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,49 +16,27 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def create_database():
-    #Создание таблицы
+async def create_database(reset: bool = False):
+    #Создание/обновление схемы без потери данных
     try:
-        async with aiosqlite.connect("starwars_characters.db") as db:
-            #Удаление таблицы
-            await db.execute("DROP TABLE IF EXISTS characters")
-
-            #Создание таблицы
-            await db.execute("""
-                CREATE TABLE characters (
-                    id INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    birth_year TEXT,
-                    eye_color TEXT,
-                    gender TEXT,
-                    hair_color TEXT,
-                    homeworld_name TEXT,
-                    mass TEXT,
-                    skin_color TEXT,
-                    -- НОВЫЕ ПОЛЯ: связанные сущности как строки через запятую
-                    films TEXT,
-                    species TEXT,
-                    starships TEXT,
-                    vehicles TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            #Оптимизация
-            await db.execute("""
-                CREATE INDEX idx_characters_name 
-                ON characters(name)
-            """)
+        async with connect() as db:
+            if reset:
+                #Явное пересоздание: персонажи, их связи и задания загрузки
+                for resource_type in RELATION_TYPES:
+                    await db.execute(f"DROP TABLE IF EXISTS {join_table(resource_type)}")
+                await db.execute("DROP TABLE IF EXISTS load_jobs")
+                await db.execute("DROP TABLE IF EXISTS characters")
+                await db.execute("PRAGMA user_version = 0")
+                await db.commit()
 
-            await db.execute("""
-                CREATE INDEX idx_characters_homeworld 
-                ON characters(homeworld_name)
-            """)
-
-            await db.commit()
+            before = await get_schema_version(db)
+            after = await migrate(db)
 
             print("=" * 100)
-            print("БАЗА ДАННЫХ СОЗДАНА")
+            if before == after:
+                print(f"СХЕМА АКТУАЛЬНА (версия {after})")
+            else:
+                print(f"СХЕМА ОБНОВЛЕНА: версия {before} -> {after}")
             print("=" * 100)
 
             # Показываем полную структуру
@@ -96,10 +80,123 @@ async def create_database():
         raise
 
 
+async def fetch_resource_uids(api_url: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    #Имя -> uid со списочных эндпоинтов API (та же предзагрузка, что у загрузчика).
+    #Импорт здесь: load_data настраивает логирование при импорте
+    import load_data
+
+    if api_url:
+        load_data.API_BASE_URL = api_url.rstrip("/")
+    cache = load_data.ResourceCache(load_data.create_rate_limiter())
+    async with load_data.create_http_session() as session:
+        await cache.prefetch(session, list(RELATION_TYPES))
+
+    uids_by_name = {resource_type: {} for resource_type in RELATION_TYPES}
+    for url, name in cache.cache.items():
+        resource_type = url.rstrip("/").rsplit("/", 2)[-2]
+        uid = uid_from_url(url)
+        if resource_type in uids_by_name and uid is not None:
+            uids_by_name[resource_type][name] = uid
+    return uids_by_name
+
+
+def collect_links(rows, uids_by_name: Dict[str, Dict[str, int]]):
+    #Строки (id, films, species, starships, vehicles) -> сущности, связи и имена без uid
+    entities = {resource_type: {} for resource_type in RELATION_TYPES}
+    links = {resource_type: [] for resource_type in RELATION_TYPES}
+    unresolved = {resource_type: set() for resource_type in RELATION_TYPES}
+
+    for row in rows:
+        character_id = row[0]
+        for resource_type, value in zip(RELATION_TYPES, row[1:]):
+            if not value:
+                continue
+            for name in value.split(", "):
+                uid = uids_by_name[resource_type].get(name)
+                if uid is None:
+                    unresolved[resource_type].add(name)
+                    continue
+                entities[resource_type][uid] = name
+                links[resource_type].append((character_id, uid))
+
+    return entities, links, unresolved
+
+
+async def normalize_database(api_url: Optional[str] = None):
+    #Перенос строк через запятую в таблицы сущностей и связей, без пересоздания characters
+    try:
+        async with connect() as db:
+            print("=" * 100)
+            print("НОРМАЛИЗАЦИЯ СВЯЗЕЙ")
+            print("=" * 100)
+
+            await migrate(db)
+
+            #uid по имени: из кэша ресурсов загрузчика и уже заполненных сущностей
+            uids_by_name = {resource_type: {} for resource_type in RELATION_TYPES}
+
+            async with db.execute("""
+                SELECT name FROM sqlite_master WHERE type='table' AND name='resource_cache'
+            """) as cursor:
+                has_cache = await cursor.fetchone()
+
+            if has_cache:
+                async with db.execute("SELECT url, name FROM resource_cache") as cursor:
+                    async for url, name in cursor:
+                        resource_type = url.rstrip("/").rsplit("/", 2)[-2]
+                        uid = uid_from_url(url)
+                        if resource_type in uids_by_name and uid is not None:
+                            uids_by_name[resource_type][name] = uid
+
+            for resource_type in RELATION_TYPES:
+                async with db.execute(f"SELECT uid, name FROM {resource_type}") as cursor:
+                    async for uid, name in cursor:
+                        uids_by_name[resource_type][name] = uid
+
+            columns = ", ".join(RELATION_TYPES)
+            async with db.execute(f"SELECT id, {columns} FROM characters") as cursor:
+                rows = await cursor.fetchall()
+
+            entities, links, unresolved = collect_links(rows, uids_by_name)
+
+            #Базы без кэша ресурсов (исходная схема): имена сопоставляем по справочникам API
+            if any(unresolved.values()):
+                print(f"\nИмен без uid в базе: {sum(len(names) for names in unresolved.values())}, "
+                      "загрузка справочников из API...")
+                for resource_type, fetched in (await fetch_resource_uids(api_url)).items():
+                    uids_by_name[resource_type].update(fetched)
+                entities, links, unresolved = collect_links(rows, uids_by_name)
+
+            if any(unresolved.values()) and not any(links.values()):
+                raise RuntimeError("ни одно имя не сопоставлено с uid (API недоступен?), база не изменена")
+
+            #Одна транзакция на всю миграцию
+            for resource_type, column in RELATION_TYPES.items():
+                await db.executemany(f"""
+                    INSERT INTO {resource_type} (uid, name) VALUES (?, ?)
+                    ON CONFLICT(uid) DO UPDATE SET name = excluded.name
+                """, list(entities[resource_type].items()))
+                await db.executemany(
+                    f"INSERT OR IGNORE INTO {join_table(resource_type)} (character_id, {column}) VALUES (?, ?)",
+                    links[resource_type]
+                )
+            await db.commit()
+
+            for resource_type in RELATION_TYPES:
+                print(f"  {resource_type:15}: {len(entities[resource_type])} сущностей, "
+                      f"{len(links[resource_type])} связей")
+                if unresolved[resource_type]:
+                    print(f"  {'':15}  пропущено имен без uid: {len(unresolved[resource_type])}")
+
+    except Exception as e:
+        logger.error(f"Ошибка нормализации: {e}")
+        raise
+
+
 async def check_database():
     #База
     try:
-        async with aiosqlite.connect("starwars_characters.db") as db:
+        async with connect() as db:
             print("=" * 100)
             print("🔍 ПРОВЕРКА СОСТОЯНИЯ БАЗЫ ДАННЫХ")
             print("=" * 100)
@@ -116,6 +213,9 @@ async def check_database():
                     return
 
             #Таблица
+            version = await get_schema_version(db)
+            print(f"\nВерсия схемы: {version} из {SCHEMA_VERSION}")
+
             async with db.execute("PRAGMA table_info(characters)") as cursor:
                 columns = await cursor.fetchall()
                 print(f"\nТаблица содержит {len(columns)} полей")
@@ -150,18 +250,25 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='Управление базой данных Star Wars')
-    parser.add_argument('--create', action='store_true', help='Создать/пересоздать таблицу')
+    parser.add_argument('--create', action='store_true', help='Создать таблицу или обновить схему')
+    parser.add_argument('--reset', action='store_true', help='Удалить персонажей и пересоздать таблицу')
     parser.add_argument('--check', action='store_true', help='Проверить состояние базы')
+    parser.add_argument('--normalize', action='store_true',
+                        help='Перенести фильмы/виды/звездолеты/транспорт в таблицы связей')
+    parser.add_argument('--api-url', help='Базовый URL API для сопоставления имен с uid при --normalize')
 
     args = parser.parse_args()
 
     try:
         if args.check:
             asyncio.run(check_database())
+        elif args.normalize:
+            asyncio.run(normalize_database(args.api_url))
         else:
-            asyncio.run(create_database())
+            asyncio.run(create_database(args.reset))
 
     except KeyboardInterrupt:
         print("\nОперация прервана")
     except Exception as e:
-        print(f"\nКритическая ошибка: {e}")
\ No newline at end of file
+        print(f"\nКритическая ошибка: {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+#Синтетический SWAPI: те же маршруты и форма JSON, что разбирает load_data.py.
+#Данные не хранятся, а вычисляются по id, поэтому 1M персонажей не занимают память
+
+RESOURCE_TYPES = ["planets", "films", "species", "starships", "vehicles"]
+
+EYE_COLORS = ["blue", "yellow", "red", "brown", "black", "green", "hazel"]
+HAIR_COLORS = ["blond", "brown", "black", "white", "grey", "none", "n/a"]
+SKIN_COLORS = ["fair", "gold", "white, blue", "light", "dark", "green", "pale"]
+GENDERS = ["male", "female", "n/a", "hermaphrodite"]
+
+
+class SyntheticSwapi:
+
+    def __init__(
+            self,
+            characters: int = 10000,
+            resources: Optional[Dict[str, int]] = None,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            rate_limit: float = 0.0,
+            retry_after: int = 1,
+            max_page_size: int = 100,
+            seed: int = 1
+    ):
+        self.characters = characters
+        self.resources = {"planets": 60, "films": 6, "species": 37, "starships": 36, "vehicles": 39}
+        self.resources.update(resources or {})
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        #429: token bucket на весь сервер; 0 - без ограничения
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    #Данные
+
+    def _pick(self, char_id: int, salt: str, options: List[str]) -> str:
+        digest = hashlib.blake2b(f"{self.seed}:{salt}:{char_id}".encode(), digest_size=4).digest()
+        return options[int.from_bytes(digest, "little") % len(options)]
+
+    def _related(self, base: str, char_id: int, resource_type: str, max_count: int) -> List[str]:
+        total = self.resources[resource_type]
+        if total == 0:
+            return []
+        #Подряд от сдвига персонажа: uid внутри персонажа не повторяются, как в SWAPI
+        count = min(total, (char_id * 7 + len(resource_type)) % (max_count + 1))
+        start = char_id * 3
+        return [f"{base}/{resource_type}/{(start + k) % total + 1}" for k in range(count)]
+
+    def person(self, base: str, char_id: int) -> Dict:
+        return {
+            "name": f"Character {char_id}",
+            "birth_year": f"{char_id % 900}BBY",
+            "eye_color": self._pick(char_id, "eye", EYE_COLORS),
+            "gender": self._pick(char_id, "gender", GENDERS),
+            "hair_color": self._pick(char_id, "hair", HAIR_COLORS),
+            "height": str(100 + char_id % 120),
+            "mass": str(40 + char_id % 100),
+            "skin_color": self._pick(char_id, "skin", SKIN_COLORS),
+            "homeworld": f"{base}/planets/{char_id % self.resources['planets'] + 1}",
+            "films": self._related(base, char_id, "films", 4),
+            "species": self._related(base, char_id, "species", 1),
+            "starships": self._related(base, char_id, "starships", 2),
+            "vehicles": self._related(base, char_id, "vehicles", 2),
+            "url": f"{base}/people/{char_id}",
+        }
+
+    def resource(self, base: str, resource_type: str, uid: int) -> Dict:
+        props = {"url": f"{base}/{resource_type}/{uid}"}
+        if resource_type == "films":
+            props["title"] = f"Episode {uid}"
+            props["episode_id"] = uid
+        else:
+            props["name"] = f"{resource_type.capitalize()} {uid}"
+        return props
+
+    #HTTP
+
+    @staticmethod
+    def base_url(request: web.Request) -> str:
+        return f"{request.url.origin()}/api"
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        #Задержка, 429 по превышению темпа и случайные 5xx
+        self.requests += 1
+
+        if not self._take_token():
+            self.throttled += 1
+            return web.json_response(
+                {"message": "Too Many Requests"}, status=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"message": "Service Unavailable"}, status=503)
+
+        return await handler(request)
+
+    def _json_with_etag(self, request: web.Request, payload: Dict) -> web.Response:
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    def _page(self, request: web.Request, resource_type: str, total: int) -> web.Response:
+        base = self.base_url(request)
+        try:
+            page = max(1, int(request.query.get("page", 1)))
+            limit = min(self.max_page_size, max(1, int(request.query.get("limit", 10))))
+        except ValueError:
+            raise web.HTTPBadRequest()
+        expanded = request.query.get("expanded") == "true"
+
+        total_pages = (total + limit - 1) // limit
+        first = (page - 1) * limit + 1
+        results = []
+        for uid in range(first, min(total, first + limit - 1) + 1):
+            if resource_type == "people":
+                props = self.person(base, uid)
+            else:
+                props = self.resource(base, resource_type, uid)
+            item = {"uid": str(uid), "name": props.get("name") or props.get("title"), "url": props["url"]}
+            if expanded:
+                item["properties"] = props
+            results.append(item)
+
+        def page_url(number):
+            return f"{base}/{resource_type}?page={number}&limit={limit}"
+
+        return web.json_response({
+            "message": "ok",
+            "total_records": total,
+            "total_pages": total_pages,
+            "previous": page_url(page - 1) if page > 1 else None,
+            "next": page_url(page + 1) if page < total_pages else None,
+            "results": results,
+        })
+
+    async def people_list(self, request: web.Request) -> web.Response:
+        return self._page(request, "people", self.characters)
+
+    async def people_detail(self, request: web.Request) -> web.Response:
+        char_id = int(request.match_info["id"])
+        if not 1 <= char_id <= self.characters:
+            raise web.HTTPNotFound()
+        return self._json_with_etag(request, {
+            "message": "ok",
+            "result": {"uid": str(char_id), "properties": self.person(self.base_url(request), char_id)},
+        })
+
+    async def resource_list(self, request: web.Request) -> web.Response:
+        resource_type = request.match_info["type"]
+        total = self.resources[resource_type]
+        if resource_type == "films":
+            #films, как в SWAPI, отдается целиком в result
+            base = self.base_url(request)
+            return web.json_response({
+                "message": "ok",
+                "result": [
+                    {"uid": str(uid), "properties": self.resource(base, "films", uid)}
+                    for uid in range(1, total + 1)
+                ],
+            })
+        return self._page(request, resource_type, total)
+
+    async def resource_detail(self, request: web.Request) -> web.Response:
+        resource_type = request.match_info["type"]
+        uid = int(request.match_info["id"])
+        if not 1 <= uid <= self.resources[resource_type]:
+            raise web.HTTPNotFound()
+        return self._json_with_etag(request, {
+            "message": "ok",
+            "result": {"uid": str(uid), "properties": self.resource(self.base_url(request), resource_type, uid)},
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": self.requests, "throttled": self.throttled, "errors": self.errors})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        types = "|".join(RESOURCE_TYPES)
+        app.router.add_get("/api/people", self.people_list)
+        app.router.add_get(r"/api/people/{id:\d+}", self.people_detail)
+        app.router.add_get(f"/api/{{type:{types}}}", self.resource_list)
+        app.router.add_get(f"/api/{{type:{types}}}/{{id:\\d+}}", self.resource_detail)
+        #Счетчики сервера для бенчмарков
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Локальный синтетический SWAPI для нагрузочных тестов')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--characters', type=int, default=10000, help='Число персонажей')
+    for resource_type in RESOURCE_TYPES:
+        parser.add_argument(f'--{resource_type}', type=int, help=f'Число {resource_type}')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, сек')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503 (0..1)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Запросов в секунду до 429 (0 - без лимита)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After для 429, сек')
+    parser.add_argument('--seed', type=int, default=1)
+
+    args = parser.parse_args()
+
+    server = SyntheticSwapi(
+        characters=args.characters,
+        resources={t: getattr(args, t) for t in RESOURCE_TYPES if getattr(args, t) is not None},
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+    print(f"SWAPI: http://{args.host}:{args.port}/api ({args.characters} персонажей)")
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+from typing import List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#Разбор ответов API из байтов: msgspec (сразу в типизированные структуры),
+#иначе orjson или стандартный json + классы со __slots__. Интерфейс один:
+#decode_person / decode_resource_name / loads. Поля нормализуются одинаково при любом
+#разборе: текст - строка или None (числа -> str), null вместо списка - пустой список
+
+PERSON_TEXT_FIELDS = (
+    "name", "birth_year", "eye_color", "gender", "hair_color",
+    "height", "mass", "skin_color", "homeworld", "url",
+)
+PERSON_LIST_FIELDS = ("films", "species", "starships", "vehicles")
+
+#Текстовое поле в ответе API: строка, иногда число
+Text = Union[str, int, float, None]
+
+
+def _text(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+if orjson is not None:
+    loads = orjson.loads
+elif msgspec is not None:
+    loads = msgspec.json.decode
+else:
+    def loads(raw):
+        return json.loads(raw)
+
+
+if msgspec is not None:
+
+    class PersonProperties(msgspec.Struct):
+        name: Text = None
+        birth_year: Text = None
+        eye_color: Text = None
+        gender: Text = None
+        hair_color: Text = None
+        height: Text = None
+        mass: Text = None
+        skin_color: Text = None
+        homeworld: Text = None
+        url: Text = None
+        films: Optional[List[str]] = None
+        species: Optional[List[str]] = None
+        starships: Optional[List[str]] = None
+        vehicles: Optional[List[str]] = None
+
+        def __post_init__(self):
+            for field in PERSON_TEXT_FIELDS:
+                setattr(self, field, _text(getattr(self, field)))
+            for field in PERSON_LIST_FIELDS:
+                if getattr(self, field) is None:
+                    setattr(self, field, [])
+
+    #Планеты, виды, звездолеты, транспорт: из свойств нужно только имя
+    class NamedProperties(msgspec.Struct):
+        name: Text = None
+
+    class FilmProperties(msgspec.Struct):
+        title: Text = None
+
+    class _PersonResult(msgspec.Struct):
+        properties: PersonProperties
+
+    class _PersonResponse(msgspec.Struct):
+        result: _PersonResult
+
+    class _NamedResult(msgspec.Struct):
+        properties: NamedProperties
+
+    class _NamedResponse(msgspec.Struct):
+        result: _NamedResult
+
+    class _FilmResult(msgspec.Struct):
+        properties: FilmProperties
+
+    class _FilmResponse(msgspec.Struct):
+        result: _FilmResult
+
+    _person_decoder = msgspec.json.Decoder(_PersonResponse)
+    _named_decoder = msgspec.json.Decoder(_NamedResponse)
+    _film_decoder = msgspec.json.Decoder(_FilmResponse)
+
+    def decode_person(raw: bytes) -> Optional[PersonProperties]:
+        try:
+            return _person_decoder.decode(raw).result.properties
+        except msgspec.DecodeError:
+            return None
+
+    def decode_resource_name(raw: bytes, resource_type: str) -> Optional[str]:
+        try:
+            if resource_type == "films":
+                return _text(_film_decoder.decode(raw).result.properties.title)
+            return _text(_named_decoder.decode(raw).result.properties.name)
+        except msgspec.DecodeError:
+            return None
+
+else:
+
+    class PersonProperties:
+        __slots__ = PERSON_TEXT_FIELDS + PERSON_LIST_FIELDS
+
+        def __init__(self, props: dict):
+            for field in PERSON_TEXT_FIELDS:
+                setattr(self, field, _text(props.get(field)))
+            for field in PERSON_LIST_FIELDS:
+                setattr(self, field, props.get(field) or [])
+
+    class NamedProperties:
+        __slots__ = ("name",)
+
+        def __init__(self, props: dict):
+            self.name = _text(props.get("name"))
+
+    class FilmProperties:
+        __slots__ = ("title",)
+
+        def __init__(self, props: dict):
+            self.title = _text(props.get("title"))
+
+    def _properties(raw: bytes) -> Optional[dict]:
+        try:
+            props = loads(raw)["result"]["properties"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        return props if isinstance(props, dict) else None
+
+    def decode_person(raw: bytes) -> Optional[PersonProperties]:
+        props = _properties(raw)
+        return PersonProperties(props) if props is not None else None
+
+    def decode_resource_name(raw: bytes, resource_type: str) -> Optional[str]:
+        props = _properties(raw)
+        if props is None:
+            return None
+        if resource_type == "films":
+            return FilmProperties(props).title
+        return NamedProperties(props).name
+
+
+def content_hash(props: PersonProperties) -> str:
+    #Хэш сохраняемых полей: сравнение при --sync, если сервер не дает ETag
+    parts = [getattr(props, field) or "" for field in PERSON_TEXT_FIELDS]
+    parts.extend("\x1e".join(map(str, getattr(props, field))) for field in PERSON_LIST_FIELDS)
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,212 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import metrics
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    #Retry-After: секунды или HTTP-дата
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class RequestSlot:
+    #Слот одного запроса: замеряет задержку и сообщает результат лимитеру
+
+    def __init__(self, limiter: "AdaptiveRateLimiter"):
+        self.limiter = limiter
+        self.status = None
+        self.retry_after = None
+        self.started = 0.0
+
+    def observe(self, response) -> None:
+        self.status = response.status
+        self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+    async def __aenter__(self) -> "RequestSlot":
+        waiting = time.monotonic()
+        await self.limiter.acquire()
+        self.started = time.monotonic()
+        metrics.HTTP_WAIT.observe(self.started - waiting)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        latency = time.monotonic() - self.started
+        #Исключение без ответа (таймаут, обрыв) считаем перегрузкой
+        failed = exc_type is not None and self.status is None
+        status = str(self.status) if self.status is not None else "error"
+        metrics.HTTP_REQUESTS.inc(status=status)
+        metrics.HTTP_LATENCY.observe(latency, status=status)
+        self.limiter.release(self.status, latency, self.retry_after, failed=failed)
+
+
+class AdaptiveRateLimiter:
+    #Token bucket (запросов в секунду) + AIMD окно одновременных запросов
+
+    def __init__(
+            self,
+            rate: float = 20.0,
+            burst: int = 20,
+            initial_concurrency: int = 10,
+            min_concurrency: int = 1,
+            max_concurrency: int = 50,
+            min_rate: float = 1.0,
+            max_rate: float = 100.0,
+            latency_target: float = 2.0,
+            decrease_factor: float = 0.5,
+            decrease_cooldown: float = 1.0
+    ):
+        #Token bucket
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+
+        #AIMD окно
+        self.window = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+
+        #Статистика
+        self.total_requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+        self._waiters = deque()
+        self._bucket_lock = asyncio.Lock()
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.min_concurrency, int(self.window))
+
+    def slot(self) -> RequestSlot:
+        return RequestSlot(self)
+
+    async def acquire(self) -> None:
+        #Место в окне
+        while self.in_flight >= self.concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._notify()
+                raise
+        self.in_flight += 1
+        metrics.HTTP_IN_FLIGHT.set(self.in_flight)
+
+        try:
+            await self._take_token()
+        except BaseException:
+            self.in_flight -= 1
+            self._notify()
+            raise
+
+    async def _take_token(self) -> None:
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+
+                #Пауза по Retry-After
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.total_requests += 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def release(
+            self,
+            status: Optional[int] = None,
+            latency: Optional[float] = None,
+            retry_after: Optional[float] = None,
+            failed: bool = False
+    ) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+
+        throttled = status == 429 or (status is not None and status >= 500)
+        slow = latency is not None and latency > self.latency_target
+
+        if throttled or failed:
+            if status == 429:
+                self.throttled += 1
+            else:
+                self.errors += 1
+            self._decrease(retry_after)
+        elif retry_after:
+            self._pause(retry_after)
+        elif slow:
+            self._decrease(None)
+        elif status is not None:
+            self._increase()
+
+        metrics.HTTP_IN_FLIGHT.set(self.in_flight)
+        metrics.LIMITER_WINDOW.set(self.window)
+        metrics.LIMITER_RATE.set(self.rate)
+        self._notify()
+
+    def _increase(self) -> None:
+        #Аддитивный рост: примерно +1 к окну за окно успешных ответов
+        self.window = min(self.max_concurrency, self.window + 1.0 / max(self.window, 1.0))
+        self.rate = min(self.max_rate, self.rate + 1.0 / max(self.window, 1.0))
+
+    def _decrease(self, retry_after: Optional[float]) -> None:
+        #Мультипликативное снижение не чаще раза за decrease_cooldown
+        now = time.monotonic()
+        if now - self.last_decrease >= self.decrease_cooldown:
+            self.last_decrease = now
+            self.window = max(float(self.min_concurrency), self.window * self.decrease_factor)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.tokens = min(self.tokens, 1.0)
+        if retry_after:
+            self._pause(retry_after)
+
+    def _pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _notify(self) -> None:
+        #Будим столько ожидающих, сколько мест свободно в окне
+        free = self.concurrency - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def retry_delay(self, attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+        #Экспоненциальная задержка с джиттером; паузу Retry-After учитывает acquire
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    async def backoff(self, attempt: int) -> None:
+        metrics.HTTP_RETRIES.inc()
+        await asyncio.sleep(self.retry_delay(attempt))
@@ -0,0 +1,236 @@
+import aiohttp
+import asyncio
+import gzip
+import json
+import logging
+import random
+from multidict import CIMultiDict, CIMultiDictProxy
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+#Заголовки ответа, которые нужны загрузчику
+RECORDED_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Retry-After"]
+
+
+class ReplayResponse:
+    #Минимальная замена aiohttp.ClientResponse: status, headers, read/text/json
+
+    def __init__(self, method: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return self._body.decode(encoding)
+
+    async def json(self, **kwargs):
+        return json.loads(self._body) if self._body else None
+
+    def release(self):
+        pass
+
+    async def __aenter__(self) -> "ReplayResponse":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FixtureStore:
+    #Ответы по ключу "METHOD URL"; на диске - gzip JSONL,
+    #первая строка - {"base_url": ...}: базовый URL API, с которым сделана запись
+
+    def __init__(self, path: Optional[str] = None, base_url: Optional[str] = None):
+        self.path = path
+        self.base_url = base_url
+        self.records: Dict[str, Dict] = {}
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        return f"{method.upper()} {url}"
+
+    @classmethod
+    def load(cls, path: str) -> "FixtureStore":
+        store = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if "method" not in record:
+                        store.base_url = record.get("base_url")
+                        continue
+                    store.records[cls.key(record["method"], record["url"])] = record
+        return store
+
+    @staticmethod
+    def read_base_url(path: str) -> Optional[str]:
+        #Базовый URL записи без загрузки ответов; у старых записей его нет
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            line = f.readline()
+        record = json.loads(line) if line.strip() else {}
+        return None if "method" in record else record.get("base_url")
+
+    def save(self, path: Optional[str] = None):
+        with gzip.open(path or self.path, "wt", encoding="utf-8") as f:
+            if self.base_url:
+                f.write(json.dumps({"base_url": self.base_url}) + "\n")
+            for record in self.records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add(self, method: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+        #Успешный ответ не затирается ошибкой повтора того же URL
+        key = self.key(method, url)
+        existing = self.records.get(key)
+        if existing and existing["status"] < 400 <= status:
+            return
+        self.records[key] = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "headers": headers,
+            "body": body.decode("utf-8", errors="replace"),
+        }
+
+    def find(self, method: str, url: str) -> Optional[Dict]:
+        #HEAD отвечаем по записи GET
+        record = self.records.get(self.key(method, url))
+        if record is None and method.upper() == "HEAD":
+            record = self.records.get(self.key("GET", url))
+        return record
+
+
+class _RecordingRequest:
+
+    def __init__(self, owner: "RecordingSession", method: str, url: str, kwargs: Dict):
+        self.owner = owner
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    async def __aenter__(self) -> ReplayResponse:
+        async with self.owner.session.request(self.method, self.url, **self.kwargs) as response:
+            body = await response.read()
+            headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+            status = response.status
+
+        if status != 304:
+            self.owner.store.add(self.method, self.url, status, headers, body)
+        return ReplayResponse(self.method, self.url, status, headers, body)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class RecordingSession:
+    #Обертка над aiohttp.ClientSession: каждый ответ сохраняется в FixtureStore
+
+    def __init__(self, session: aiohttp.ClientSession, path: str, base_url: Optional[str] = None):
+        self.session = session
+        self.store = FixtureStore(path, base_url)
+
+    def get(self, url: str, **kwargs) -> _RecordingRequest:
+        return _RecordingRequest(self, "GET", url, kwargs)
+
+    def head(self, url: str, **kwargs) -> _RecordingRequest:
+        return _RecordingRequest(self, "HEAD", url, kwargs)
+
+    async def close(self):
+        self.store.save()
+        await self.session.close()
+
+    async def __aenter__(self) -> "RecordingSession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class _ReplayRequest:
+
+    def __init__(self, owner: "ReplaySession", method: str, url: str, headers: Optional[Dict]):
+        self.owner = owner
+        self.method = method
+        self.url = url
+        self.headers = headers or {}
+
+    async def __aenter__(self) -> ReplayResponse:
+        return await self.owner.respond(self.method, self.url, self.headers)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class ReplaySession:
+    #Ответы из локального хранилища вместо сети, с задержкой и внесением ошибок
+
+    def __init__(
+            self,
+            store: FixtureStore,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            error_status: int = 503,
+            seed: Optional[int] = None
+    ):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+        self.requests = 0
+        self.misses = 0
+        self.injected_errors = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplaySession":
+        return cls(FixtureStore.load(path), **kwargs)
+
+    async def respond(self, method: str, url: str, headers: Dict) -> ReplayResponse:
+        self.requests += 1
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            return ReplayResponse(method, url, self.error_status, {}, b"")
+
+        record = self.store.find(method, url)
+        if record is None:
+            self.misses += 1
+            return ReplayResponse(method, url, 404, {}, b"")
+
+        #Условные запросы, как у настоящего сервера
+        etag = record["headers"].get("ETag")
+        if etag and headers.get("If-None-Match") == etag:
+            return ReplayResponse(method, url, 304, record["headers"], b"")
+
+        body = b"" if method.upper() == "HEAD" else record["body"].encode("utf-8")
+        return ReplayResponse(method, url, record["status"], record["headers"], body)
+
+    def get(self, url: str, headers: Optional[Dict] = None, **kwargs) -> _ReplayRequest:
+        return _ReplayRequest(self, "GET", url, headers)
+
+    def head(self, url: str, headers: Optional[Dict] = None, **kwargs) -> _ReplayRequest:
+        return _ReplayRequest(self, "HEAD", url, headers)
+
+    async def close(self):
+        #Промахи почти всегда значат другой базовый URL, чем при записи
+        if self.misses:
+            recorded = f" (запись сделана с {self.store.base_url})" if self.store.base_url else ""
+            logger.warning(f"Воспроизведение: {self.misses} из {self.requests} запросов нет в записи{recorded}")
+
+    async def __aenter__(self) -> "ReplaySession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
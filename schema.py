@@ -0,0 +1,209 @@
+import aiosqlite
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+#Связанные сущности: тип -> колонка в таблице связей
+RELATION_TYPES = {
+    "films": "film_id",
+    "species": "species_id",
+    "starships": "starship_id",
+    "vehicles": "vehicle_id",
+}
+
+
+def join_table(resource_type: str) -> str:
+    return f"character_{resource_type}"
+
+
+def uid_from_url(url: Optional[str]) -> Optional[int]:
+    #SWAPI uid - последний сегмент URL
+    if not url:
+        return None
+    try:
+        return int(url.rstrip("/").rsplit("/", 1)[-1])
+    except ValueError:
+        return None
+
+
+async def create_relation_tables(db: aiosqlite.Connection):
+    #Сущности по uid + таблицы связей; обратный индекс покрывает запросы "все персонажи фильма".
+    #Без внешних ключей: связи персонажа перезаписывает save_relations, а каскад
+    #при INSERT OR REPLACE в characters стирал бы их
+    for resource_type, column in RELATION_TYPES.items():
+        table = join_table(resource_type)
+
+        await db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {resource_type} (
+                uid INTEGER PRIMARY KEY,
+                name TEXT NOT NULL
+            )
+        """)
+        await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{resource_type}_name ON {resource_type}(name)")
+
+        await db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                character_id INTEGER NOT NULL,
+                {column} INTEGER NOT NULL,
+                PRIMARY KEY (character_id, {column})
+            ) WITHOUT ROWID
+        """)
+        await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column}, character_id)")
+
+
+async def save_relations(
+        db: aiosqlite.Connection,
+        relations: Dict[int, Dict[str, List[Tuple[int, str]]]]
+):
+    #relations: id персонажа -> тип -> [(uid, имя)]; связи персонажа перезаписываются целиком.
+    #Коммит делает вызывающий код
+    character_ids = [(cid,) for cid in relations]
+
+    for resource_type, column in RELATION_TYPES.items():
+        table = join_table(resource_type)
+        entities = {}
+        links = []
+        for character_id, by_type in relations.items():
+            for uid, name in by_type.get(resource_type, []):
+                entities[uid] = name
+                links.append((character_id, uid))
+
+        if entities:
+            await db.executemany(f"""
+                INSERT INTO {resource_type} (uid, name) VALUES (?, ?)
+                ON CONFLICT(uid) DO UPDATE SET name = excluded.name
+            """, list(entities.items()))
+
+        await db.executemany(f"DELETE FROM {table} WHERE character_id = ?", character_ids)
+        if links:
+            await db.executemany(
+                f"INSERT OR IGNORE INTO {table} (character_id, {column}) VALUES (?, ?)",
+                links
+            )
+
+
+#Колонки characters в порядке INSERT
+CHARACTER_COLUMNS = [
+    "id", "name", "birth_year", "eye_color", "gender", "hair_color",
+    "homeworld_name", "mass", "skin_color", "films", "species",
+    "starships", "vehicles", "etag", "last_modified", "content_hash",
+]
+
+#Колонки инкрементальной синхронизации
+SYNC_COLUMNS = ["etag", "last_modified", "content_hash"]
+
+
+async def table_columns(db: aiosqlite.Connection, table: str) -> List[str]:
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return [row[1] for row in await cursor.fetchall()]
+
+
+async def _migration_1_characters(db: aiosqlite.Connection):
+    #Базовая таблица; индексы с едиными именами вместо idx_name/idx_homeworld
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            birth_year TEXT,
+            eye_color TEXT,
+            gender TEXT,
+            hair_color TEXT,
+            homeworld_name TEXT,
+            mass TEXT,
+            skin_color TEXT,
+            -- связанные сущности как строки через запятую
+            films TEXT,
+            species TEXT,
+            starships TEXT,
+            vehicles TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("DROP INDEX IF EXISTS idx_name")
+    await db.execute("DROP INDEX IF EXISTS idx_homeworld")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_characters_name ON characters(name)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_characters_homeworld ON characters(homeworld_name)")
+
+
+async def _migration_2_sync_columns(db: aiosqlite.Connection):
+    #ETag/Last-Modified/хэш для --sync
+    columns = await table_columns(db, "characters")
+    for column in SYNC_COLUMNS:
+        if column not in columns:
+            await db.execute(f"ALTER TABLE characters ADD COLUMN {column} TEXT")
+
+
+async def _migration_3_resource_cache(db: aiosqlite.Connection):
+    #Кэш связанных сущностей между запусками
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS resource_cache (
+            url TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_resource_cache_access ON resource_cache(last_access)")
+
+
+async def _migration_4_relations(db: aiosqlite.Connection):
+    #Нормализованные связи с фильмами, видами, звездолетами и транспортом
+    await create_relation_tables(db)
+
+
+async def _migration_5_load_jobs(db: aiosqlite.Connection):
+    #Очередь заданий загрузки для возобновления
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS load_jobs (
+            id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_retry_at REAL NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_load_jobs_status ON load_jobs(status, next_retry_at)")
+
+
+#Шаги по порядку: версия = номер в списке. Шаги только добавляются в конец.
+#Шаги идемпотентны: старые базы без user_version могли уже содержать часть схемы
+MIGRATIONS = [
+    _migration_1_characters,
+    _migration_2_sync_columns,
+    _migration_3_resource_cache,
+    _migration_4_relations,
+    _migration_5_load_jobs,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(db: aiosqlite.Connection) -> int:
+    #Применение недостающих шагов; каждый шаг в своей транзакции вместе с user_version
+    current = await get_schema_version(db)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"Версия схемы базы {current} новее поддерживаемой {SCHEMA_VERSION}")
+
+    await db.commit()
+    for version, step in enumerate(MIGRATIONS[current:], start=current + 1):
+        try:
+            await db.execute("BEGIN")
+            await step(db)
+            await db.execute(f"PRAGMA user_version = {version}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        logger.info(f"Схема обновлена до версии {version}: {step.__name__}")
+
+    return SCHEMA_VERSION
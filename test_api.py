@@ -1,14 +1,15 @@
-import aiohttp
 import asyncio
 import sys
 
+from http_client import create_client_session
+
 
 async def test_api():
-    async with aiohttp.ClientSession() as session:
+    async with create_client_session() as session:
         #Тест 1: Запись
         print("Тест записи")
         try:
-            async with session.get("https://www.swapi.tech/api/people/1", timeout=10) as response:
+            async with session.get("https://www.swapi.tech/api/people/1") as response:
                 print(f"Тест 1: HTTP {response.status}")
                 if response.status == 200:
                     data = await response.json()
@@ -21,7 +22,7 @@ async def test_api():
         #Тест 2: Страница
         print("\nТест страницы")
         try:
-            async with session.get("https://www.swapi.tech/api/people?page=1", timeout=10) as response:
+            async with session.get("https://www.swapi.tech/api/people?page=1") as response:
                 print(f"Тест 2: HTTP {response.status}")
                 if response.status == 200:
                     data = await response.json()
@@ -0,0 +1,230 @@
+import json
+import re
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import aiohttp
+from yarl import URL
+
+import metrics
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+#Спаны исходящих запросов через aiohttp.TraceConfig: шаблон URL, фазы
+#(очередь пула, DNS, соединение с TLS, ожидание заголовков, чтение тела), байты, попытка
+
+#Числовые сегменты пути - параметр шаблона
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+ENDPOINT_LATENCY = metrics.registry.histogram(
+    "swapi_http_endpoint_seconds", "Полная длительность запроса по шаблону URL", ["method", "endpoint"]
+)
+
+
+def url_template(url) -> str:
+    #/api/people/5?x=1 -> /api/people/{id}
+    return ID_SEGMENT.sub("/{id}", URL(str(url)).path)
+
+
+#Приемники спанов
+
+
+class JsonlSink:
+    #Спан - строка JSON в файле
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def emit(self, span: Dict):
+        self.file.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class RingBufferSink:
+    #Последние N спанов в памяти
+
+    def __init__(self, size: int = 1000):
+        self.spans = deque(maxlen=size)
+
+    def emit(self, span: Dict):
+        self.spans.append(span)
+
+    def close(self):
+        pass
+
+
+class OpenTelemetrySink:
+    #Спаны в OpenTelemetry API: экспортер (OTLP и т.п.) настраивается в TracerProvider
+
+    def __init__(self, name: str = "swapi-loader"):
+        if otel_trace is None:
+            raise RuntimeError("Для OpenTelemetry нужен пакет opentelemetry-api")
+        self.tracer = otel_trace.get_tracer(name)
+
+    def emit(self, span: Dict):
+        otel_span = self.tracer.start_span(
+            f"{span['method']} {span['endpoint']}",
+            kind=otel_trace.SpanKind.CLIENT,
+            start_time=int(span["start"] * 1e9),
+            attributes={
+                "http.request.method": span["method"],
+                "url.full": span["url"],
+                "url.template": span["endpoint"],
+                "http.response.status_code": span["status"] or 0,
+                "http.response.body.size": span["bytes"],
+                "http.request.resend_count": span["attempt"],
+                **{f"swapi.phase.{name}_ms": value for name, value in span["phases"].items()},
+            },
+        )
+        if span["error"]:
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, span["error"]))
+        otel_span.end(end_time=int((span["start"] + span["duration_ms"] / 1000) * 1e9))
+
+    def close(self):
+        pass
+
+
+class RequestTracer:
+    #Собирает фазы запроса из сигналов TraceConfig и отдает готовый спан приемникам
+
+    def __init__(self, sinks: Optional[List] = None):
+        self.sinks = list(sinks or [])
+        #Спаны с непрочитанным телом: закрываются при чтении или в flush()
+        self.open_spans: Dict[int, SimpleNamespace] = {}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        config = aiohttp.TraceConfig(trace_config_ctx_factory=self._context)
+        config.on_request_start.append(self._on_request_start)
+        config.on_connection_queued_start.append(self._mark("queue_start"))
+        config.on_connection_queued_end.append(self._mark("queue_end"))
+        config.on_connection_create_start.append(self._mark("connect_start"))
+        config.on_connection_create_end.append(self._mark("connect_end"))
+        config.on_connection_reuseconn.append(self._on_reuse)
+        config.on_dns_resolvehost_start.append(self._mark("dns_start"))
+        config.on_dns_resolvehost_end.append(self._mark("dns_end"))
+        config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        config.on_request_headers_sent.append(self._mark("headers_sent"))
+        config.on_request_end.append(self._on_request_end)
+        config.on_response_chunk_received.append(self._on_chunk)
+        config.on_request_exception.append(self._on_exception)
+        return config
+
+    @staticmethod
+    def _context(trace_request_ctx=None) -> SimpleNamespace:
+        return SimpleNamespace(trace_request_ctx=trace_request_ctx, marks={}, span=None)
+
+    @staticmethod
+    def _mark(name: str):
+        async def handler(session, context, params):
+            context.marks[name] = time.perf_counter()
+        return handler
+
+    async def _on_request_start(self, session, context, params):
+        request_ctx = context.trace_request_ctx or {}
+        context.marks["start"] = time.perf_counter()
+        context.span = {
+            "start": time.time(),
+            "method": params.method,
+            "url": str(params.url),
+            "endpoint": url_template(params.url),
+            "attempt": request_ctx.get("attempt", 0) if isinstance(request_ctx, dict) else 0,
+            "status": None,
+            "bytes": 0,
+            "reused_connection": False,
+            "dns_cache_hit": False,
+            "error": None,
+            "phases": {},
+            "duration_ms": 0.0,
+        }
+
+    async def _on_reuse(self, session, context, params):
+        context.span["reused_connection"] = True
+
+    async def _on_dns_cache_hit(self, session, context, params):
+        context.span["dns_cache_hit"] = True
+
+    async def _on_request_end(self, session, context, params):
+        span = context.span
+        marks = context.marks
+        marks["headers_received"] = time.perf_counter()
+        span["status"] = params.response.status
+
+        phases = span["phases"]
+        for name, start, end in (
+                ("queued", "queue_start", "queue_end"),
+                ("dns", "dns_start", "dns_end"),
+                ("connect", "connect_start", "connect_end"),
+        ):
+            if start in marks and end in marks:
+                phases[name] = round((marks[end] - marks[start]) * 1000, 3)
+        sent = marks.get("headers_sent", marks["start"])
+        phases["ttfb"] = round((marks["headers_received"] - sent) * 1000, 3)
+
+        #Без тела (HEAD, 304, пустой ответ) спан готов сразу
+        length = params.response.content_length
+        if params.method == "HEAD" or span["status"] in (204, 304) or length == 0:
+            self._finish(context, marks["headers_received"])
+        else:
+            self.open_spans[id(context)] = context
+
+    async def _on_chunk(self, session, context, params):
+        if context.span is None:
+            return
+        context.span["bytes"] += len(params.chunk)
+        if id(context) in self.open_spans:
+            now = time.perf_counter()
+            context.span["phases"]["body"] = round((now - context.marks["headers_received"]) * 1000, 3)
+            self._finish(context, now)
+
+    async def _on_exception(self, session, context, params):
+        if context.span is None:
+            return
+        context.span["error"] = f"{type(params.exception).__name__}: {params.exception}"
+        self._finish(context, time.perf_counter())
+
+    def _finish(self, context: SimpleNamespace, ended: float):
+        self.open_spans.pop(id(context), None)
+        span = context.span
+        span["duration_ms"] = round((ended - context.marks["start"]) * 1000, 3)
+        ENDPOINT_LATENCY.observe(span["duration_ms"] / 1000, method=span["method"], endpoint=span["endpoint"])
+        for sink in self.sinks:
+            sink.emit(span)
+
+    def flush(self):
+        #Ответы, тело которых не читали (ошибки): длительность - до заголовков
+        for context in list(self.open_spans.values()):
+            self._finish(context, context.marks["headers_received"])
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+
+def slowest_endpoints(limit: int = 5) -> List[Dict]:
+    #Шаблоны URL по убыванию p95 полной длительности
+    endpoints = []
+    for labels, stats in ENDPOINT_LATENCY.summary().items():
+        fields = dict(pair.split("=", 1) for pair in labels.split(","))
+        endpoints.append({"method": fields["method"], "endpoint": fields["endpoint"], **stats})
+    endpoints.sort(key=lambda e: e["p95"], reverse=True)
+    return endpoints[:limit]
+
+
+def print_slowest_endpoints(limit: int = 5):
+    endpoints = slowest_endpoints(limit)
+    if not endpoints:
+        return
+    print("\nСАМЫЕ МЕДЛЕННЫЕ ЭНДПОИНТЫ (p95):")
+    print("-" * 100)
+    for e in endpoints:
+        print(f"  {e['method']:4} {e['endpoint']:40} p95 {e['p95'] * 1000:8.1f} мс  "
+              f"среднее {e['avg'] * 1000:8.1f} мс  запросов {e['count']}")
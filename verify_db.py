@@ -1,100 +1,193 @@
-import aiosqlite
 import asyncio
+import csv
+import io
+import json
 import sys
+from typing import List, Optional, TextIO
 
+from character import Character
+from db import connect
+from schema import CHARACTER_COLUMNS, SYNC_COLUMNS
+
+#Строк за один fetchmany
+VERIFY_CHUNK_SIZE = 500
+
+#Поля вывода
+CHARACTER_FIELDS = [
+    'id', 'name', 'homeworld_name', 'birth_year', 'gender', 'mass',
+    'eye_color', 'hair_color', 'skin_color',
+    'films', 'species', 'starships', 'vehicles'
+]
+
+LIST_FIELDS = ['films', 'species', 'starships', 'vehicles']
+
+#Колонки для Character.from_row: без колонок синхронизации, их нет в старых базах
+SELECT_COLUMNS = [column for column in CHARACTER_COLUMNS if column not in SYNC_COLUMNS]
+
+
+def split_names(value: Optional[str]) -> List[str]:
+    return value.split(', ') if value else []
+
+
+def format_table(char: Character) -> str:
+    #Карточка персонажа
+    lines = [
+        f"\n{'=' * 100}",
+        f"ID: {char.id} |{char.name}",
+        f"{'=' * 100}",
+        #Информация
+        f"Планета:      {char.homeworld_name}",
+        f"Рождение:     {char.birth_year}",
+        f"Пол:          {char.gender}",
+        f"Масса:        {char.mass}",
+        f"Цвет глаз:    {char.eye_color}",
+        f"Цвет волос:   {char.hair_color}",
+        f"Цвет кожи:    {char.skin_color}",
+    ]
+
+    if char.films:
+        films_list = split_names(char.films)
+        lines.append(f"Фильмы ({len(films_list)}):")
+        lines.extend(f"{film}" for film in films_list)
+
+    if char.species:
+        species_list = split_names(char.species)
+        lines.append(f"Виды ({len(species_list)}):")
+        lines.extend(f"{species}" for species in species_list)
+
+    if char.starships:
+        starships_list = split_names(char.starships)
+        lines.append(f"Звездолеты ({len(starships_list)}):")
+        lines.extend(f"{ship}" for ship in starships_list)
+
+    if char.vehicles:
+        vehicles_list = split_names(char.vehicles)
+        lines.append(f"Транспорт ({len(vehicles_list)}):")
+        lines.extend(f"      • {vehicle}" for vehicle in vehicles_list)
+
+    return "\n".join(lines) + "\n"
+
+
+def field_values(char: Character) -> List:
+    return [getattr(char, field) for field in CHARACTER_FIELDS]
+
+
+def format_json(char: Character) -> str:
+    record = dict(zip(CHARACTER_FIELDS, field_values(char)))
+    for field in LIST_FIELDS:
+        record[field] = split_names(record[field])
+    return json.dumps(record, ensure_ascii=False)
+
+
+async def print_structure(db, out: TextIO):
+    #Проверка
+    parts = ["=" * 100, "\nПРОВЕРКА БАЗЫ ДАННЫХ", "\n" + "=" * 100,
+             "\n\nСТРУКТУРА ТАБЛИЦЫ:", "\n" + "=" * 100 + "\n"]
+
+    async with db.execute("PRAGMA table_info(characters)") as cursor:
+        columns = await cursor.fetchall()
+
+    required_fields = [
+        'id', 'name', 'birth_year', 'eye_color', 'gender', 'hair_color',
+        'homeworld_name', 'mass', 'skin_color', 'films', 'species',
+        'starships', 'vehicles'
+    ]
+
+    for col in columns:
+        field_name = col[1]
+        is_required = "ОБЯЗАТЕЛЬНОЕ" if field_name in required_fields else "ДОПОЛНИТЕЛЬНОЕ"
+        parts.append(f"  {field_name:20} {col[2]:15} {is_required}\n")
+
+    #Записи
+    async with db.execute("SELECT COUNT(*) FROM characters") as cursor:
+        total = await cursor.fetchone()
+    parts.append(f"\nВсего персонажей: {total[0]}\n")
+
+    out.write("".join(parts))
+    return total[0]
+
+
+async def verify_full_database(
+        limit: Optional[int] = None,
+        offset: int = 0,
+        ids: Optional[List[int]] = None,
+        fmt: str = "table",
+        out: Optional[TextIO] = None
+):
+    #Проверка базы данных: курсор читается порциями, вывод - одной записью на порцию
+    if out is None:
+        out = sys.stdout
 
-async def verify_full_database():
-    #Проверка базы данных
     try:
-        async with aiosqlite.connect("starwars_characters.db") as db:
-            print("=" * 100)
-            print("ПРОВЕРКА БАЗЫ ДАННЫХ")
-            print("=" * 100)
-
-            #Проверка
-            print("\nСТРУКТУРА ТАБЛИЦЫ:")
-            print("=" * 100)
-
-            async with db.execute("PRAGMA table_info(characters)") as cursor:
-                columns = await cursor.fetchall()
-
-                required_fields = [
-                    'id', 'name', 'birth_year', 'eye_color', 'gender', 'hair_color',
-                    'homeworld_name', 'mass', 'skin_color', 'films', 'species',
-                    'starships', 'vehicles'
-                ]
-
-                for col in columns:
-                    field_name = col[1]
-                    is_required = "ОБЯЗАТЕЛЬНОЕ" if field_name in required_fields else "ДОПОЛНИТЕЛЬНОЕ"
-                    print(f"  {field_name:20} {col[2]:15} {is_required}")
-
-            #Записи
-            async with db.execute("SELECT COUNT(*) FROM characters") as cursor:
-                total = await cursor.fetchone()
-                print(f"\nВсего персонажей: {total[0]}")
-
-            if total[0] > 0:
+        async with connect(readonly=True) as db:
+            if fmt == "table":
+                total = await print_structure(db, out)
+                if total == 0:
+                    return
                 #Персонажи
-                print("\nВСЕ ПЕРСОНАЖИ:")
-                print("=" * 100)
-
-                async with db.execute("""
-                    SELECT 
-                        id, name, homeworld_name, birth_year, gender, mass,
-                        eye_color, hair_color, skin_color,
-                        films, species, starships, vehicles
-                    FROM characters 
-                    ORDER BY id
-                """) as cursor:
-                    all_chars = await cursor.fetchall()
-
-                    for char in all_chars:
-                        print(f"\n{'=' * 100}")
-                        print(f"ID: {char[0]} |{char[1]}")
-                        print(f"{'=' * 100}")
-
-                        #Информация
-                        print(f"Планета:      {char[2]}")
-                        print(f"Рождение:     {char[3]}")
-                        print(f"Пол:          {char[4]}")
-                        print(f"Масса:        {char[5]}")
-                        print(f"Цвет глаз:    {char[6]}")
-                        print(f"Цвет волос:   {char[7]}")
-                        print(f"Цвет кожи:    {char[8]}")
-
-                        if char[9]:
-                            films_list = char[9].split(', ')
-                            print(f"Фильмы ({len(films_list)}):")
-                            for film in films_list:
-                                print(f"{film}")
-
-                        if char[10]:
-                            species_list = char[10].split(', ')
-                            print(f"Виды ({len(species_list)}):")
-                            for species in species_list:
-                                print(f"{species}")
-
-                        if char[11]:
-                            starships_list = char[11].split(', ')
-                            print(f"Звездолеты ({len(starships_list)}):")
-                            for ship in starships_list:
-                                print(f"{ship}")
-
-                        if char[12]:
-                            vehicles_list = char[12].split(', ')
-                            print(f"Транспорт ({len(vehicles_list)}):")
-                            for vehicle in vehicles_list:
-                                print(f"      • {vehicle}")
-
-                print(f"\n{'=' * 100}")
+                out.write("\nВСЕ ПЕРСОНАЖИ:\n" + "=" * 100 + "\n")
+
+            query = f"SELECT {', '.join(SELECT_COLUMNS)} FROM characters"
+            params = []
+            if ids:
+                query += f" WHERE id IN ({', '.join('?' * len(ids))})"
+                params.extend(ids)
+            query += " ORDER BY id LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset])
+
+            csv_writer = None
+            buffer = io.StringIO()
+            first = True
+
+            if fmt == "csv":
+                csv_writer = csv.writer(buffer)
+                csv_writer.writerow(CHARACTER_FIELDS)
+            elif fmt == "json":
+                buffer.write("[")
+
+            async with db.execute(query, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(VERIFY_CHUNK_SIZE)
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        char = Character.from_row(row)
+                        if fmt == "table":
+                            buffer.write(format_table(char))
+                        elif fmt == "csv":
+                            csv_writer.writerow(field_values(char))
+                        else:
+                            buffer.write(("\n" if first else ",\n") + format_json(char))
+                        first = False
+
+                    out.write(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+
+            if fmt == "table":
+                buffer.write(f"\n{'=' * 100}\n")
+            elif fmt == "json":
+                buffer.write("\n]\n")
+            out.write(buffer.getvalue())
+            out.flush()
 
     except Exception as e:
-        print(f"\nОшибка: {e}")
+        print(f"\nОшибка: {e}", file=sys.stderr)
 
 
 if __name__ == "__main__":
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-    asyncio.run(verify_full_database())
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Просмотр персонажей в базе')
+    parser.add_argument('--limit', type=int, help='Не больше N персонажей')
+    parser.add_argument('--offset', type=int, default=0, help='Пропустить первые N персонажей')
+    parser.add_argument('--id', type=int, action='append', dest='ids', help='Только указанный ID (можно несколько)')
+    parser.add_argument('--format', choices=['table', 'json', 'csv'], default='table', help='Формат вывода')
+
+    args = parser.parse_args()
+
+    asyncio.run(verify_full_database(args.limit, args.offset, args.ids, args.format))